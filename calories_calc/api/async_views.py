@@ -0,0 +1,67 @@
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+
+from .views import EatenProductViewSet, ProductViewSet, TotalKcalViewSet
+
+
+async def authenticate(view, request):
+    for authentication_class in view.cls.authentication_classes:
+        authenticator = authentication_class()
+        if hasattr(authenticator, 'authenticate_async'):
+            user_auth = await authenticator.authenticate_async(request)
+        else:
+            user_auth = await sync_to_async(authenticator.authenticate)(
+                request)
+        if user_auth is not None:
+            return user_auth
+    return None
+
+
+def run_view(view, request, args, kwargs):
+    # Синхронная часть запроса проходит полный dispatch вьюсета:
+    # initial() с согласованием формата, правами и троттлингом,
+    # действие и finalize_response.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        response.render()
+        plain_response = HttpResponse(response.content,
+                                      status=response.status_code)
+        for name, value in response.items():
+            plain_response[name] = value
+        return plain_response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(viewset_class, basename, action='list'):
+    view = viewset_class.as_view({'get': action}, basename=basename,
+                                 detail=action != 'list')
+
+    async def async_view(request, *args, **kwargs):
+        # Django 3.2 выполняет все thread-sensitive вызовы в одном потоке.
+        # Чтение идет в общем пуле потоков, а свой контекст нужен, чтобы
+        # поиск сотрудника в базе при аутентификации тоже не ждал других
+        # запросов.
+        async with ThreadSensitiveContext():
+            try:
+                user_auth = await authenticate(view, request)
+            except APIException:
+                # Ошибку с нужными заголовками вернет синхронная
+                # аутентификация вьюсета.
+                user_auth = None
+            if user_auth is not None:
+                request._force_auth_user, request._force_auth_token = (
+                    user_auth)
+            return await sync_to_async(run_view, thread_sensitive=False)(
+                view, request, args, kwargs)
+
+    return async_view
+
+
+product_list = async_read_view(ProductViewSet, 'products')
+product_detail = async_read_view(ProductViewSet, 'products', 'retrieve')
+eaten_product_list = async_read_view(EatenProductViewSet, 'my_products')
+total_kcal_list = async_read_view(TotalKcalViewSet, 'total_kcal')
@@ -0,0 +1,88 @@
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from calories.versions import (add_token_version, get_token_version,
+                               token_version)
+
+STAFF_CLAIM = 'is_staff'
+ACTIVE_CLAIM = 'is_active'
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class ClaimsRefreshToken(RefreshToken):
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[STAFF_CLAIM] = user.is_staff
+        token[ACTIVE_CLAIM] = user.is_active
+        token[TOKEN_VERSION_CLAIM] = token_version(user)
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        return ClaimsRefreshToken.for_user(user)
+
+
+class ClaimsTokenObtainPairView(TokenObtainPairView):
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+
+    def check_token_version(self, validated_token, version):
+        if (not validated_token.get(ACTIVE_CLAIM, False)
+                or validated_token.get(TOKEN_VERSION_CLAIM) != version):
+            raise AuthenticationFailed('Токен отозван.',
+                                       code='token_revoked')
+
+    def get_token_user(self, validated_token):
+        # Пользователь из claims без запроса к базе, если версия токенов
+        # пользователя есть в общем кеше.
+        if (validated_token.get(STAFF_CLAIM, True)
+                or TOKEN_VERSION_CLAIM not in validated_token):
+            return None
+        version = get_token_version(
+            validated_token.get(api_settings.USER_ID_CLAIM))
+        if version is None:
+            return None
+        self.check_token_version(validated_token, version)
+        return TokenUser(validated_token)
+
+    def get_user(self, validated_token):
+        user = self.get_token_user(validated_token)
+        if user is not None:
+            return user
+        user = super().get_user(validated_token)
+        if TOKEN_VERSION_CLAIM not in validated_token:
+            # Токены, выданные до появления версий, проверяются только
+            # по пользователю в базе, как раньше.
+            return user
+        version = token_version(user)
+        add_token_version(user.id, version)
+        self.check_token_version(validated_token, version)
+        return user
+
+    async def authenticate_async(self, request):
+        # Пользователь из claims проверяется в цикле событий, в базу
+        # ходят только токены сотрудников и старые токены.
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_token_user(validated_token)
+        if user is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        return user, validated_token
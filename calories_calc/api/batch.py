@@ -0,0 +1,108 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import permissions
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from calories.constants import BATCH_MAX_REQUESTS, BATCH_MAX_WORKERS
+from .authentication import ClaimsJWTAuthentication
+from .serializers import BatchRequestSerializer
+
+# Заголовки внешнего запроса, которые не должны попасть в подзапросы.
+DROPPED_META = ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_IF_NONE_MATCH',
+                'HTTP_IF_MODIFIED_SINCE', 'CONTENT_TYPE', 'CONTENT_LENGTH')
+
+
+class BatchView(APIView):
+    authentication_classes = (ClaimsJWTAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    # Вьюсеты роутера, к которым разрешены подзапросы.
+    viewsets = ()
+
+    def build_request(self, request, method, url, body):
+        data = b'' if body is None else json.dumps(body).encode()
+        sub_request = HttpRequest()
+        sub_request.method = method
+        sub_request.path = sub_request.path_info = url.path
+        sub_request.META = {
+            key: value for key, value in request.META.items()
+            if key not in DROPPED_META
+        }
+        sub_request.META.update({
+            'REQUEST_METHOD': method,
+            'QUERY_STRING': url.query,
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(data)),
+        })
+        sub_request.GET = QueryDict(url.query)
+        sub_request._stream = BytesIO(data)
+        sub_request._read_started = False
+        # Пользователь уже аутентифицирован внешним запросом.
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    def dispatch_sub_request(self, request, item):
+        url = urlsplit(item['path'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            match = None
+        if (match is None
+                or getattr(match.func, 'cls', None) not in self.viewsets):
+            return {'status': NotFound.status_code,
+                    'body': {'detail': NotFound.default_detail}}
+        sub_request = self.build_request(request, item['method'], url,
+                                         item.get('body'))
+        sub_request.resolver_match = match
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        return {'status': response.status_code,
+                'body': getattr(response, 'data', None)}
+
+    def dispatch_in_thread(self, request, item):
+        try:
+            return self.dispatch_sub_request(request, item)
+        finally:
+            connections.close_all()
+
+    def dispatch_reads(self, request, items):
+        if len(items) < 2:
+            return [self.dispatch_sub_request(request, item)
+                    for item in items]
+        with ThreadPoolExecutor(
+                max_workers=min(BATCH_MAX_WORKERS, len(items))) as executor:
+            futures = [
+                executor.submit(copy_context().run, self.dispatch_in_thread,
+                                request, item)
+                for item in items
+            ]
+            return [future.result() for future in futures]
+
+    def post(self, request):
+        serializer = BatchRequestSerializer(
+            data=request.data, many=True, allow_empty=False,
+            max_length=BATCH_MAX_REQUESTS)
+        serializer.is_valid(raise_exception=True)
+        # Чтения между записями выполняются параллельно, записи — по
+        # порядку, поэтому чтения после записи видят ее результат.
+        responses = []
+        reads = []
+        for item in serializer.validated_data:
+            if item['method'] in SAFE_METHODS:
+                reads.append(item)
+                continue
+            responses.extend(self.dispatch_reads(request, reads))
+            reads = []
+            responses.append(self.dispatch_sub_request(request, item))
+        responses.extend(self.dispatch_reads(request, reads))
+        return Response(responses)
@@ -1,10 +1,51 @@
+from django.db import router
+from django.db.models.expressions import RawSQL
 from rest_framework import filters
 
+from calories import search
+from calories.models import Product
+from calories.registry import category_registry
+
 
 class CategoryFilter(filters.BaseFilterBackend):
 
     def filter_queryset(self, request, queryset, view):
         category_slug = request.query_params.get('category')
         if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+            category_id = category_registry.id_for(category_slug)
+            if category_id is None:
+                return queryset.none()
+            queryset = queryset.filter(category_id=category_id)
         return queryset
+
+
+class ProductSearchView:
+    search_fields = ('name',)
+    search_product_lookup = 'id'
+
+
+class ProductNameSearchFilter(filters.SearchFilter):
+
+    def filter_queryset(self, request, queryset, view):
+        product_lookup = getattr(view, 'search_product_lookup', None)
+        if product_lookup is None:
+            return super().filter_queryset(request, queryset, view)
+        if queryset.db != router.db_for_read(Product):
+            # Дневник в шарде: подзапрос к каталогу выполняется отдельно.
+            products = self.filter_queryset(
+                request, Product.objects.all(), ProductSearchView)
+            if products.query.where:
+                queryset = queryset.filter(**{
+                    f'{product_lookup}__in': list(
+                        products.values_list('id', flat=True))
+                })
+            return queryset
+        if not search.is_available():
+            return super().filter_queryset(request, queryset, view)
+        query = request.query_params.get(self.search_param, '')
+        if not search.match_expression(query):
+            return queryset
+        return queryset.filter(**{
+            f'{product_lookup}__in': RawSQL(
+                *search.product_ids_subquery(query))
+        })
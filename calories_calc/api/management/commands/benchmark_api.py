@@ -0,0 +1,161 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+
+from api.authentication import ClaimsRefreshToken
+from api.urls import router
+from calories.constants import CATALOG_VERSION
+from calories.models import Category, DailyKcalTotal, EatenProduct, Product
+from calories.versions import bump_version
+
+User = get_user_model()
+
+PERCENTILES = (50, 95, 99)
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все эндпойнты роутера API в процессе и сохраняет '
+            'задержки, число запросов к БД и строки в секунду в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='load_user_0')
+        parser.add_argument('--admin-username', default='load_admin')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Не очищать кеш ответов между запросами.')
+        parser.add_argument('--output', type=Path,
+                            default=Path('benchmark.json'))
+
+    def get_scenarios(self, user):
+        product = Product.objects.order_by('id').first()
+        category = Category.objects.order_by('id').first()
+        eaten_product = EatenProduct.objects.filter(user=user).first()
+        daily_total = DailyKcalTotal.objects.filter(user=user).first()
+        if None in (product, category, eaten_product, daily_total):
+            raise CommandError('Сначала заполните базу: manage.py seed_load')
+        word = product.name.split()[0]
+        return {
+            'categories-list': ({}, {}, True),
+            'categories-detail': ({'slug': category.slug}, {}, True),
+            'products-list': ({}, {'category': category.slug}, False),
+            'products-detail': ({'pk': product.id}, {}, False),
+            'products-autocomplete': ({}, {'q': word[:3]}, False),
+            'my_products-list': ({}, {}, False),
+            'my_products-detail': ({'pk': eaten_product.id}, {}, False),
+            'my_products-export': ({}, {'format': 'ndjson'}, False),
+            'total_kcal-list': ({}, {}, False),
+            'total_kcal-detail': (
+                {'publication_date': daily_total.date}, {}, False),
+            'total_kcal-summary': ({}, {'bucket': 'month'}, False),
+        }
+
+    def get_router_routes(self):
+        return {
+            url.name for url in router.urls
+            if url.name and url.name != 'api-root'
+        }
+
+    def count_rows(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content).count(b'\n')
+        data = response.json()
+        if isinstance(data, dict) and 'results' in data:
+            return len(data['results'])
+        if isinstance(data, list):
+            return len(data)
+        return 1
+
+    def run_scenario(self, client, path, params, iterations, warm_cache):
+        latencies, queries, rows = [], [], 0
+        for _ in range(iterations):
+            if not warm_cache:
+                # Новая версия каталога сбрасывает только кеш ответов.
+                bump_version(CATALOG_VERSION)
+            with ExitStack() as stack:
+                contexts = [stack.enter_context(
+                    CaptureQueriesContext(connections[alias]))
+                    for alias in connections]
+                started = time.perf_counter()
+                response = client.get(path, params)
+                rows += self.count_rows(response)
+                latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{path}: ответ {response.status_code}')
+            queries.append(sum(
+                len(context.captured_queries) for context in contexts))
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        return {
+            'path': path,
+            'params': params,
+            'iterations': iterations,
+            **{f'p{percentile}_ms': round(cuts[percentile - 1] * 1000, 3)
+               for percentile in PERCENTILES},
+            'queries_per_request': statistics.mean(queries),
+            'rows_per_second': round(rows / sum(latencies), 1),
+        }
+
+    def get_client(self, username):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден')
+        token = ClaimsRefreshToken.for_user(user).access_token
+        return user, Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get_revision(self):
+        try:
+            return subprocess.run(
+                ('git', 'rev-parse', 'HEAD'), capture_output=True,
+                text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **options):
+        user, client = self.get_client(options['username'])
+        _, admin_client = self.get_client(options['admin_username'])
+        scenarios = self.get_scenarios(user)
+        missing = self.get_router_routes() - scenarios.keys()
+        if missing:
+            self.stderr.write(
+                'Не измеряются (изменяющие данные или новые): '
+                f'{", ".join(sorted(missing))}')
+        results = {}
+        setup_test_environment()
+        try:
+            for name, (kwargs, params, as_admin) in scenarios.items():
+                results[name] = self.run_scenario(
+                    admin_client if as_admin else client,
+                    reverse(name, kwargs=kwargs), params,
+                    options['iterations'], options['warm_cache'])
+                self.stdout.write(
+                    f'{name:<24} p50 {results[name]["p50_ms"]:>9} мс  '
+                    f'p99 {results[name]["p99_ms"]:>9} мс  '
+                    f'запросов {results[name]["queries_per_request"]:>5}')
+        finally:
+            teardown_test_environment()
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'revision': self.get_revision(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'endpoints': results,
+        }
+        options['output'].write_text(
+            json.dumps(report, indent=2, ensure_ascii=False, default=str),
+            encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты сохранены в {options["output"]}'))
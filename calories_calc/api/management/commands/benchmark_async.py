@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api.authentication import ClaimsRefreshToken
+
+User = get_user_model()
+
+ENDPOINTS = ('products/', 'my_products/', 'total_kcal/')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает запросы в секунду синхронных и асинхронных '
+            'эндпойнтов чтения при конкурентных клиентах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True,
+                            help='Пользователь, от имени которого '
+                                 'выполняются запросы.')
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def run_sync(self, path, headers, clients, requests):
+
+        def get(_):
+            try:
+                return Client().get(path, **headers).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            return list(executor.map(get, range(requests)))
+
+    async def run_async(self, path, headers, clients, requests):
+        semaphore = asyncio.Semaphore(clients)
+        client = AsyncClient()
+
+        async def get():
+            async with semaphore:
+                response = await client.get(path, **headers)
+                return response.status_code
+
+        return await asyncio.gather(*(get() for _ in range(requests)))
+
+    def measure(self, run):
+        started = time.monotonic()
+        statuses = run()
+        elapsed = time.monotonic() - started
+        failed = sum(status != 200 for status in statuses)
+        return len(statuses) / elapsed, failed
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('Пользователь не найден')
+        token = f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+        clients, requests = options['clients'], options['requests']
+        setup_test_environment()
+        try:
+            self.compare(token, clients, requests)
+        finally:
+            teardown_test_environment()
+
+    def compare(self, token, clients, requests):
+        for endpoint in ENDPOINTS:
+            sync_rps, sync_failed = self.measure(lambda: self.run_sync(
+                f'/api/{endpoint}', {'HTTP_AUTHORIZATION': token},
+                clients, requests))
+            async_rps, async_failed = self.measure(lambda: asyncio.run(
+                self.run_async(f'/api/async/{endpoint}',
+                               {'authorization': token},
+                               clients, requests)))
+            self.stdout.write(
+                f'{endpoint:<15} sync: {sync_rps:8.1f} req/s '
+                f'({sync_failed} ошибок), async: {async_rps:8.1f} req/s '
+                f'({async_failed} ошибок)')
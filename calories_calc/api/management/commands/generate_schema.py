@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from calories_calc.schema import generate_schema
+
+FORMATS = ('json', 'yaml')
+
+
+class Command(BaseCommand):
+    help = ('Генерирует схему OpenAPI и сохраняет ее на диск, '
+            'чтобы документация не собиралась при каждом запросе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', type=Path,
+                            default=settings.SCHEMA_DIR)
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for schema_format in FORMATS:
+            path = output_dir / f'schema.{schema_format}'
+            path.write_bytes(generate_schema(schema_format))
+            self.stdout.write(f'Схема сохранена в {path}')
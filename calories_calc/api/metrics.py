@@ -0,0 +1,218 @@
+import asyncio
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNMATCHED_ROUTE = 'unmatched'
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RouteMetrics:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'db_seconds',
+                 'serializer_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = Lock()
+
+    def observe(self, route, seconds, stats, response_bytes):
+        with self.lock:
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics()
+            metrics.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            metrics.count += 1
+            metrics.seconds += seconds
+            metrics.queries += stats.queries
+            metrics.db_seconds += stats.db_seconds
+            metrics.serializer_seconds += stats.serializer_seconds
+            metrics.response_bytes += response_bytes
+
+    def add_response_bytes(self, route, response_bytes):
+        with self.lock:
+            metrics = self.routes.get(route)
+            if metrics is not None:
+                metrics.response_bytes += response_bytes
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+    def render(self):
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = [
+                '# HELP http_request_duration_seconds Request latency.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for route, metrics in routes:
+                cumulative = 0
+                bounds = (*LATENCY_BUCKETS, '+Inf')
+                for bound, count in zip(bounds, metrics.buckets):
+                    cumulative += count
+                    lines.append(
+                        f'http_request_duration_seconds_bucket'
+                        f'{{route="{route}",le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum'
+                             f'{{route="{route}"}} {metrics.seconds}')
+                lines.append(f'http_request_duration_seconds_count'
+                             f'{{route="{route}"}} {metrics.count}')
+            for name, attribute, help_text in COUNTERS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for route, metrics in routes:
+                    lines.append(f'{name}{{route="{route}"}} '
+                                 f'{getattr(metrics, attribute)}')
+        return '\n'.join(lines) + '\n'
+
+
+COUNTERS = (
+    ('http_request_db_queries_total', 'queries', 'Database queries.'),
+    ('http_request_db_seconds_total', 'db_seconds',
+     'Time spent in database queries.'),
+    ('http_request_serializer_seconds_total', 'serializer_seconds',
+     'Time spent in serializer to_representation.'),
+    ('http_response_bytes_total', 'response_bytes', 'Response body size.'),
+)
+
+registry = MetricsRegistry()
+
+
+def add_serializer_seconds(seconds):
+    stats = current_stats.get()
+    if stats is not None:
+        stats.serializer_seconds += seconds
+
+
+def time_serializer(serializer):
+    stats = current_stats.get()
+    if stats is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed_to_representation(instance):
+        started = perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            stats.serializer_seconds += perf_counter() - started
+
+    serializer.to_representation = timed_to_representation
+    return serializer
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в MiddlewareMixin: синхронный middleware заставил бы
+            # Django выполнять асинхронные вью через async_to_sync в одном
+            # потоке.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.observe(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.observe(request, response, stats, started)
+
+    def observe(self, request, response, stats, started):
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = getattr(resolver_match, 'url_name', None) or UNMATCHED_ROUTE
+        registry.observe(
+            route, perf_counter() - started, stats,
+            0 if response.streaming else len(response.content))
+        if response.streaming:
+            response.streaming_content = self.count_streamed_bytes(
+                route, response.streaming_content)
+        return response
+
+    def count_streamed_bytes(self, route, content):
+        # Размер потокового ответа известен только после отправки.
+        response_bytes = 0
+        try:
+            for chunk in content:
+                response_bytes += len(chunk)
+                yield chunk
+        finally:
+            registry.add_response_bytes(route, response_bytes)
+
+
+def has_metrics_access(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+
+def metrics_view(request):
+    if not has_metrics_access(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,184 @@
+from hashlib import md5
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from calories.routers import (is_pinned_to_primary, pin_to_primary,
+                              read_from_replica, replicas_refreshed_at)
+from calories.versions import get_version, get_versions
+from .metrics import add_serializer_seconds, time_serializer
+from .pagination import BoundedPageNumberPagination
+
+
+class VersionedCacheMixin:
+    cache_version_name = None
+
+    def get_cache_key(self, request):
+        query = sorted(
+            (key, value) for key in request.query_params
+            for value in request.query_params.getlist(key)
+        )
+        signature = md5(
+            f'{request.build_absolute_uri(request.path)}{query}'.encode()
+        ).hexdigest()
+        return (f'response:{self.basename}:{self.action}:'
+                f'{get_version(self.cache_version_name)}:{signature}')
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    conditional_version_names = ()
+
+    def get_conditional_version_names(self):
+        return self.conditional_version_names
+
+    def get_conditional_key(self, request):
+        return request.get_full_path()
+
+    def get_validators(self, request):
+        names = self.get_conditional_version_names()
+        versions, last_modified = get_versions(names)
+        signature = md5(
+            f'{self.basename}:{self.action}:{names}:{versions}:'
+            f'{request.accepted_renderer.format}:'
+            f'{self.get_conditional_key(request)}'.encode()
+        ).hexdigest()
+        return quote_etag(signature), int(last_modified)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request,
+                                         *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request,
+                                         *args, **kwargs)
+
+
+class ReplicaReadMixin:
+
+    def get_replica_version_names(self):
+        # Данные, измененные после начала последнего копирования
+        # в реплики, читаются с основной базы.
+        get_names = getattr(self, 'get_conditional_version_names', None)
+        return () if get_names is None else get_names()
+
+    def can_read_from_replica(self, request):
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in SAFE_METHODS):
+            return False
+        refreshed = replicas_refreshed_at()
+        if (refreshed is None
+                or is_pinned_to_primary(request.user.id, refreshed)):
+            return False
+        names = self.get_replica_version_names()
+        if not names:
+            return True
+        _, last_modified = get_versions(names)
+        return last_modified < refreshed
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.replica_token = read_from_replica.set(
+            self.can_read_from_replica(request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            read_from_replica.reset(token)
+            self.replica_token = None
+        if (settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user.id)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PageNumberOptInMixin:
+    page_number_pagination_class = BoundedPageNumberPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            page_query_param = (
+                self.page_number_pagination_class.page_query_param)
+            if page_query_param in self.request.query_params:
+                self._paginator = self.page_number_pagination_class()
+                return self._paginator
+        return super().paginator
+
+
+class SerializerMetricsMixin:
+
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer(super().get_serializer(*args, **kwargs))
+
+
+class ValuesListMixin:
+    # Пары (поле ответа, поле values()) в порядке полей сериализатора.
+    values_list_fields = ()
+
+    def get_values_list_fields(self):
+        return self.values_list_fields
+
+    def get_values_list_converters(self, rows):
+        return {}
+
+    def to_values_representation(self, row, converters):
+        return {
+            name: (converters[name](row[lookup])
+                   if name in converters and row[lookup] is not None
+                   else row[lookup])
+            for name, lookup in self.get_values_list_fields()
+        }
+
+    def list(self, request, *args, **kwargs):
+        if (not settings.FAST_JSON
+                or request.accepted_renderer.format != 'json'):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *dict.fromkeys(
+                ('id', *(lookup for _, lookup
+                         in self.get_values_list_fields()))))
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset if page is None else page)
+        started = perf_counter()
+        converters = self.get_values_list_converters(rows)
+        data = [self.to_values_representation(row, converters)
+                for row in rows]
+        add_serializer_seconds(perf_counter() - started)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,99 @@
+import datetime as dt
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+MAX_PAGE_SIZE = 100
+
+
+class BoundedPageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetPagination(pagination.CursorPagination):
+    date_field = 'publication_date'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-publication_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        if reverse:
+            queryset = queryset.order_by(self.date_field, 'id')
+        else:
+            queryset = queryset.order_by(f'-{self.date_field}', '-id')
+        if self.cursor:
+            queryset = queryset.filter(self.get_position_filter(
+                *self.cursor['position'], reverse))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_position_filter(self, date, id, reverse):
+        if reverse:
+            return (Q(**{f'{self.date_field}__gte': date}) &
+                    (Q(**{f'{self.date_field}__gt': date}) | Q(id__gt=id)))
+        return (Q(**{f'{self.date_field}__lte': date}) &
+                (Q(**{f'{self.date_field}__lt': date}) | Q(id__lt=id)))
+
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            return [str(instance[self.date_field]), instance['id']]
+        return [str(getattr(instance, self.date_field)), instance.id]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return None
+        return self.encode_cursor({
+            'position': self.get_position(self.page[-1]), 'reverse': False})
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor({
+            'position': self.get_position(self.page[0]), 'reverse': True})
+
+    def encode_cursor(self, cursor):
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            date, id = cursor['position']
+            return {'position': (dt.date.fromisoformat(date), int(id)),
+                    'reverse': bool(cursor['reverse'])}
+        except (BinasciiError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class TotalKcalKeysetPagination(KeysetPagination):
+    date_field = 'date'
+    ordering = ('-date', '-id')
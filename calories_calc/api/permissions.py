@@ -13,4 +13,4 @@ class AdminOrReadOnly(permissions.BasePermission):
 class AccessForUser(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return obj.user_id == request.user.id
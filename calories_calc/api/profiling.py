@@ -0,0 +1,125 @@
+import cProfile
+import random
+from contextlib import ExitStack
+from datetime import datetime
+from time import perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.html import format_html, format_html_join
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import ClaimsJWTAuthentication
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+MAX_PROFILES = 50
+
+
+def get_profile_dir():
+    return settings.PROFILER['DIRECTORY']
+
+
+# Параметры запросов не сохраняются: в них данные дневников, логины
+# и хеши паролей.
+class QueryLog(list):
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.append((perf_counter() - started, sql))
+
+
+class ProfilerMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.PROFILER['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILER['SAMPLE_RATE']
+        get_profile_dir().mkdir(parents=True, exist_ok=True)
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        try:
+            user_auth = ClaimsJWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return user_auth is not None and user_auth[0].is_staff
+
+    def should_profile(self, request):
+        if self.sample_rate and random.randrange(self.sample_rate) == 0:
+            return True
+        requested = (PROFILE_HEADER in request.META
+                     or PROFILE_QUERY_PARAM in request.GET)
+        return requested and self.is_staff(request)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        queries = QueryLog()
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = profiler.runcall(self.get_response, request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        profile_id = '{}-{}-{}'.format(
+            datetime.now().strftime('%Y%m%d%H%M%S%f'),
+            getattr(resolver_match, 'url_name', None) or 'unmatched',
+            uuid4().hex[:8])
+        self.save(profile_id, request, profiler, queries)
+        prune_profiles()
+        response[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    def save(self, profile_id, request, profiler, queries):
+        directory = get_profile_dir()
+        profiler.dump_stats(directory / f'{profile_id}.prof')
+        lines = [f'{request.method} {request.path}',
+                 f'{len(queries)} queries, '
+                 f'{sum(seconds for seconds, _ in queries):.6f} s', '']
+        lines.extend(f'{seconds:.6f} {sql}' for seconds, sql in queries)
+        (directory / f'{profile_id}.sql').write_text(
+            '\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def recent_profiles():
+    directory = get_profile_dir()
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob('*.prof'), reverse=True)[:MAX_PROFILES]
+
+
+def prune_profiles():
+    # Идентификаторы начинаются с времени, поэтому старые профили идут
+    # в конце обратной сортировки.
+    for path in sorted(get_profile_dir().glob('*.prof'),
+                       reverse=True)[MAX_PROFILES:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.sql').unlink(missing_ok=True)
+
+
+def profile_list_view(request):
+    rows = format_html_join(
+        '\n', '<li>{} — <a href="{}">.prof</a> <a href="{}">.sql</a></li>',
+        ((path.stem, path.name, f'{path.stem}.sql')
+         for path in recent_profiles()))
+    return HttpResponse(format_html(
+        '<h1>Профили запросов</h1><ul>{}</ul>', rows))
+
+
+def profile_file_view(request, name):
+    path = get_profile_dir() / name
+    if (path.suffix not in ('.prof', '.sql') or path.name != name
+            or not path.is_file()):
+        raise Http404
+    return FileResponse(path.open('rb'), as_attachment=True)
@@ -1,7 +1,37 @@
-from django.shortcuts import get_object_or_404
+from datetime import date, timedelta
+
 from rest_framework import serializers
 
-from calories.models import Category, EatenProduct, Product
+from calories.constants import BATCH_METHODS, SUMMARY_DEFAULT_DAYS
+from calories.models import (Category, DailyKcalTotal, EatenProduct,
+                             Product)
+from calories.registry import category_registry
+from calories.summary import BUCKET_WEEK, BUCKETS
+
+
+class CategorySlugField(serializers.RelatedField):
+    default_error_messages = {
+        'does_not_exist': 'Категория со слагом {slug_name} не найдена.',
+        'invalid': 'Некорректное значение.',
+    }
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        category = category_registry.get(data)
+        if category is None:
+            self.fail('does_not_exist', slug_name=data)
+        return category
+
+    def to_representation(self, value):
+        # Версию реестра проверяем один раз на весь список.
+        root = self.root
+        if not hasattr(root, '_category_slugs'):
+            root._category_slugs = category_registry.slugs()
+        return root._category_slugs.get(value.pk)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -16,10 +46,7 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
-    category = serializers.SlugRelatedField(
-        queryset=Category.objects.all(),
-        slug_field='slug'
-    )
+    category = CategorySlugField(queryset=Category.objects.all())
 
     class Meta:
         model = Product
@@ -27,35 +54,105 @@ class ProductSerializer(serializers.ModelSerializer):
 
 
 class EatenProductSerializer(serializers.ModelSerializer):
-    user = serializers.HiddenField(
-        default=serializers.CurrentUserDefault())
-    category = serializers.SlugRelatedField(
-        read_only=True, slug_field='slug'
+    product = serializers.PrimaryKeyRelatedField(
+        queryset=Product.objects.all()
     )
+    category = CategorySlugField(read_only=True)
 
     class Meta:
         model = EatenProduct
-        fields = '__all__'
+        exclude = ('user',)
         read_only_fields = ('publication_date', 'kcal',
                             'unit_of_measurement')
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        product_name = get_object_or_404(Product, id=representation[
-            'product']).name
-        representation['product'] = product_name
+        representation['product'] = instance.product.name
         return representation
 
 
-class TotalKcalSerializer(serializers.ModelSerializer):
-    total_kcal_for_day = serializers.IntegerField(read_only=True)
-    date = serializers.DateField(read_only=True,
-                                 source='publication_date')
-    lookup_field = 'publication_date'
-    extra_kwargs = {
-        'url': {'lookup_field': 'publication_date'}
-    }
+class EatenProductBulkListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        products = Product.objects.in_bulk(
+            {item['product_id'] for item in attrs})
+        does_not_exist = (serializers.PrimaryKeyRelatedField
+                          .default_error_messages['does_not_exist'])
+        errors = []
+        for item in attrs:
+            product = products.get(item['product_id'])
+            if product is None:
+                errors.append({'product': [
+                    does_not_exist.format(pk_value=item['product_id'])
+                ]})
+            else:
+                item['product'] = product
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        eaten_products = [
+            EatenProduct(
+                product=item['product'],
+                weight=item['weight'],
+                kcal=item['product'].kcal_for(item['weight']),
+                unit_of_measurement=item['product'].unit_of_measurement,
+                category_id=item['product'].category_id,
+                user_id=item['user_id'],
+            ) for item in validated_data
+        ]
+        EatenProduct.objects.bulk_create(eaten_products)
+        DailyKcalTotal.objects.add_eaten_products(eaten_products)
+        return eaten_products
+
+
+class EatenProductBulkSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField(source='product_id')
 
     class Meta:
         model = EatenProduct
+        fields = ('product', 'weight')
+        list_serializer_class = EatenProductBulkListSerializer
+
+
+class TotalKcalSerializer(serializers.ModelSerializer):
+    total_kcal_for_day = serializers.IntegerField(read_only=True,
+                                                  source='total_kcal')
+
+    class Meta:
+        model = DailyKcalTotal
         fields = ('date', 'total_kcal_for_day')
+
+
+class TotalKcalSummaryQuerySerializer(serializers.Serializer):
+    bucket = serializers.ChoiceField(choices=BUCKETS, default=BUCKET_WEEK)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['from'] = serializers.DateField(required=False)
+        fields['to'] = serializers.DateField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        attrs.setdefault('to', date.today())
+        attrs.setdefault('from', attrs['to'] - timedelta(
+            days=SUMMARY_DEFAULT_DAYS - 1))
+        if attrs['from'] > attrs['to']:
+            raise serializers.ValidationError(
+                {'from': 'Начало периода позже его окончания.'})
+        return attrs
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=BATCH_METHODS, default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith('/'):
+            raise serializers.ValidationError(
+                'Путь должен начинаться с /.')
+        return value
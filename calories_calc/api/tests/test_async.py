@@ -0,0 +1,107 @@
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient
+from rest_framework.test import APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.authentication import ClaimsRefreshToken
+from api.metrics import registry
+from calories.models import Category, EatenProduct, Product
+from calories.versions import state_cache
+
+
+User = get_user_model()
+
+
+# Чтение выполняется в пуле потоков со своими соединениями с базой.
+class TestAsyncReadEndpoints(APITransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        state_cache.clear()
+        self.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        self.product = Product.objects.create(
+            name='product',
+            weight=100,
+            unit_of_measurement='гр',
+            kcal=100,
+            category=self.category
+        )
+        self.author = User.objects.create(username='author')
+        for weight in (100, 50):
+            EatenProduct.objects.create(
+                product=self.product,
+                weight=weight,
+                kcal=weight,
+                category=self.category,
+                user=self.author
+            )
+        self.auth_header = (
+            f'Bearer {ClaimsRefreshToken.for_user(self.author).access_token}')
+        self.PATHS = (
+            ('products/', False),
+            (f'products/{self.product.id}/', False),
+            ('products/?category=slug&search=pro', False),
+            ('my_products/', True),
+            ('my_products/?page_size=1', True),
+            ('total_kcal/', True),
+        )
+
+    async def test_async_responses_match_sync_responses(self):
+        async_client = AsyncClient()
+        for path, authenticated in self.PATHS:
+            headers = {}
+            asgi_headers = {}
+            if authenticated:
+                headers['HTTP_AUTHORIZATION'] = self.auth_header
+                asgi_headers['authorization'] = self.auth_header
+            with self.subTest(path=path):
+                sync_response = await sync_to_async(self.client.get)(
+                    f'/api/{path}', **headers)
+                async_response = await async_client.get(
+                    f'/api/async/{path}', **asgi_headers)
+                self.assertEqual(async_response.status_code, HTTPStatus.OK)
+                expected = sync_response.json()
+                if isinstance(expected, dict) and 'next' in expected:
+                    expected['next'] = (expected['next'] or '').replace(
+                        '/api/', '/api/async/') or None
+                self.assertEqual(async_response.json(), expected)
+
+    async def test_async_endpoints_require_authentication(self):
+        response = await AsyncClient().get('/api/async/my_products/')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+        response = await AsyncClient().get(
+            '/api/async/my_products/', authorization='Bearer invalid')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = await AsyncClient().get('/api/async/products/0/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    async def test_tokens_without_claims_are_checked_against_database(self):
+        token = f'Bearer {RefreshToken.for_user(self.author).access_token}'
+        response = await AsyncClient().get('/api/async/my_products/',
+                                           authorization=token)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    async def test_async_endpoints_negotiate_content(self):
+        response = await AsyncClient().get('/api/async/products/',
+                                           accept='application/xml')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_ACCEPTABLE)
+        response = await AsyncClient().get('/api/async/products/')
+        self.assertIn('ETag', response)
+
+    async def test_async_requests_are_measured(self):
+        registry.reset()
+        await AsyncClient().get('/api/async/products/')
+        text = registry.render()
+        self.assertIn('http_request_duration_seconds_count'
+                      '{route="async-products-list"} 1', text)
+        self.assertNotIn('http_request_db_queries_total'
+                         '{route="async-products-list"} 0', text)
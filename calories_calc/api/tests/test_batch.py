@@ -0,0 +1,100 @@
+from datetime import date
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient, APITransactionTestCase
+
+from api.authentication import ClaimsJWTAuthentication, ClaimsRefreshToken
+from calories.constants import BATCH_MAX_REQUESTS
+from calories.models import Category, EatenProduct, Product
+
+
+User = get_user_model()
+
+BATCH_PATH = '/api/batch/'
+
+
+# Чтения выполняются в отдельных потоках со своими соединениями, поэтому
+# данные теста должны быть закоммичены.
+class TestBatch(APITransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.category = Category.objects.create(name='category', slug='slug')
+        self.product = Product.objects.create(
+            name='product', weight=100, unit_of_measurement='гр', kcal=100,
+            category=self.category)
+        EatenProduct.objects.create(product=self.product, weight=100,
+                                    kcal=100, category=self.category,
+                                    user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=(
+            f'Bearer {ClaimsRefreshToken.for_user(self.user).access_token}'))
+
+    def batch(self, requests):
+        response = self.client.post(BATCH_PATH, requests, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()
+
+    def test_home_screen_reads_in_one_request(self):
+        authenticate = ClaimsJWTAuthentication.authenticate
+        with mock.patch.object(ClaimsJWTAuthentication, 'authenticate',
+                               autospec=True,
+                               side_effect=authenticate) as patched:
+            responses = self.batch([
+                {'path': '/api/products/?category=slug'},
+                {'path': f'/api/my_products/?publication_date='
+                         f'{date.today()}'},
+                {'path': '/api/total_kcal/'},
+                {'path': '/api/categories/'},
+            ])
+        self.assertEqual(patched.call_count, 1)
+        self.assertEqual([response['status'] for response in responses],
+                         [200, 200, 200, 403])
+        self.assertEqual(responses[0]['body']['results'][0]['name'],
+                         'product')
+        self.assertEqual(len(responses[1]['body']['results']), 1)
+        self.assertEqual(
+            responses[2]['body']['results'][0]['total_kcal_for_day'], 100)
+
+    def test_writes_run_in_order_before_following_reads(self):
+        responses = self.batch([
+            {'method': 'POST', 'path': '/api/my_products/',
+             'body': {'product': self.product.id, 'weight': 50}},
+            {'path': '/api/my_products/'},
+            {'path': '/api/total_kcal/'},
+        ])
+        self.assertEqual(responses[0]['status'], 201)
+        created_id = responses[0]['body']['id']
+        self.assertEqual(len(responses[1]['body']['results']), 2)
+        self.assertEqual(
+            responses[2]['body']['results'][0]['total_kcal_for_day'], 150)
+        responses = self.batch([
+            {'method': 'DELETE', 'path': f'/api/my_products/{created_id}/'},
+            {'path': '/api/my_products/'},
+        ])
+        self.assertEqual(responses[0]['status'], 204)
+        self.assertEqual(len(responses[1]['body']['results']), 1)
+
+    def test_only_router_paths_are_allowed(self):
+        responses = self.batch([
+            {'path': '/api/auth/users/me/'},
+            {'path': BATCH_PATH},
+            {'path': '/api/unknown/'},
+        ])
+        self.assertEqual({response['status'] for response in responses},
+                         {404})
+
+    def test_invalid_batches_are_rejected(self):
+        for requests in ([], [{'path': 'api/products/'}],
+                         [{'path': '/api/products/'}] *
+                         (BATCH_MAX_REQUESTS + 1)):
+            with self.subTest(requests=len(requests)):
+                response = self.client.post(BATCH_PATH, requests,
+                                            format='json')
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+        response = APIClient().post(
+            BATCH_PATH, [{'path': '/api/products/'}], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
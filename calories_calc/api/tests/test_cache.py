@@ -0,0 +1,89 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from calories.versions import (add_token_version, bump_version,
+                               get_token_version, user_diary_version)
+from calories_calc.backends.cache import SQLiteCache
+
+
+class TestSQLiteCache(SimpleTestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'state.sqlite3'
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_values_are_shared_between_instances(self):
+        self.cache.set_many({'number': 1, 'text': 'text', 'flag': True},
+                            None)
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(
+            other.get_many(['number', 'text', 'flag', 'missing']),
+            {'number': 1, 'text': 'text', 'flag': True})
+        self.assertIs(other.get('flag'), True)
+
+    def test_add_keeps_live_value_and_replaces_expired(self):
+        self.assertTrue(self.cache.add('key', 'first', None))
+        self.assertFalse(self.cache.add('key', 'second', None))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.cache.set('key', 'expired', 0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'third', None))
+        self.assertEqual(self.cache.get('key'), 'third')
+
+    def test_expired_keys_are_culled_on_write(self):
+        self.cache.set('expired', 1, 0)
+        self.cache.culled_at = 0
+        self.cache.set('live', 1, None)
+        rows = self.cache.connection.execute(
+            'SELECT key FROM cache').fetchall()
+        self.assertEqual(rows, [(self.cache.make_key('live'),)])
+
+    def test_incr_is_atomic_across_threads(self):
+        self.cache.set('counter', 0, None)
+
+        def increment():
+            cache = SQLiteCache(self.path, {})
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_touch_and_delete(self):
+        self.cache.set('key', 'value', 0)
+        self.assertFalse(self.cache.touch('key', None))
+        self.cache.set('key', 'value', 60)
+        self.assertTrue(self.cache.touch('key', None))
+        self.assertTrue(self.cache.delete('key'))
+        self.assertFalse(self.cache.delete('key'))
+
+    def expires(self, key):
+        return self.cache.connection.execute(
+            'SELECT expires FROM cache WHERE key = ?',
+            (self.cache.make_key(key),)).fetchone()[0]
+
+    @override_settings(USER_STATE_TIMEOUT=60)
+    def test_only_global_versions_never_expire(self):
+        with mock.patch('calories.versions.state_cache', self.cache):
+            bump_version('catalog')
+            bump_version(user_diary_version(1))
+            add_token_version(1, 'version')
+            self.assertEqual(get_token_version(1), 'version')
+        self.assertIsNone(self.expires('version:catalog'))
+        self.assertIsNone(self.expires('version:catalog:modified'))
+        for key in ('version:diary:1', 'version:diary:1:modified',
+                    'token_version:1'):
+            self.assertIsNotNone(self.expires(key))
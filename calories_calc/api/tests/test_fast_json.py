@@ -0,0 +1,85 @@
+import json
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from api.authentication import ClaimsRefreshToken
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from calories.models import Category, EatenProduct, Product
+
+User = get_user_model()
+
+
+class TestFastJSON(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        fruits = Category.objects.create(name='Фрукты', slug='fruits')
+        drinks = Category.objects.create(name='Напитки', slug='drinks')
+        products = [
+            Product.objects.create(name='Яблоко', weight=3, kcal=100,
+                                   unit_of_measurement='гр',
+                                   category=fruits),
+            Product.objects.create(name='Сок "Вишня"', weight=100, kcal=45,
+                                   unit_of_measurement='мл',
+                                   category=drinks),
+            Product.objects.create(name='Без категории', weight=1, kcal=7,
+                                   unit_of_measurement='шт'),
+        ]
+        for number in range(7):
+            EatenProduct.objects.create(
+                product=products[number % 3], weight=number + 1,
+                kcal=products[number % 3].kcal_for(number + 1),
+                unit_of_measurement=products[number % 3].unit_of_measurement,
+                category=products[number % 3].category, user=cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=(
+                'Bearer '
+                f'{ClaimsRefreshToken.for_user(self.author).access_token}'))
+
+    def get(self, path):
+        cache.clear()
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_values_path_matches_serializers(self):
+        paths = [
+            '/api/products/',
+            '/api/products/?category=fruits',
+            '/api/products/?search=яблоко',
+            '/api/my_products/?page_size=3',
+            '/api/my_products/?page=2',
+            '/api/my_products/?category=drinks',
+            '/api/total_kcal/',
+        ]
+        paths.append(self.get('/api/my_products/?page_size=3').data['next'])
+        for path in paths:
+            with self.subTest(path=path):
+                expected = self.get(path)
+                with override_settings(FAST_JSON=True):
+                    actual = self.get(path)
+                self.assertEqual(json.loads(actual.content),
+                                 json.loads(expected.content))
+                self.assertEqual(actual.data, expected.data)
+                self.assertEqual(ORJSONRenderer().render(actual.data),
+                                 JSONRenderer().render(expected.data))
+
+    def test_orjson_parser_matches_json_parser(self):
+        body = json.dumps({'product': 1, 'weight': 50,
+                           'name': 'Яблоко'}).encode()
+        self.assertEqual(ORJSONParser().parse(BytesIO(body)),
+                         JSONParser().parse(BytesIO(body)))
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"product": NaN}'))
@@ -1,12 +1,33 @@
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from http import HTTPStatus
+from importlib import import_module
+from io import StringIO
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.signals import request_started
+from django.db import NotSupportedError, close_old_connections, connection
 from django.test import TestCase
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from calories.models import Category, EatenProduct, Product
+from calories.constants import BULK_MAX_ITEMS, CATEGORY_VERSION
+from calories.models import (Category, DailyKcalTotal, EatenProduct,
+                             Product)
+from calories.registry import category_registry
+from calories.sync import diary_changes
+from calories.versions import bump_version, state_cache
+from calories_calc.backends.cache import SQLiteCache
 
 
 User = get_user_model()
@@ -239,3 +260,911 @@ class TestEditDelete(APITestCase, UserCredentials):
         new_count = EatenProduct.objects.count()
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertEqual(initial_count, new_count)
+
+
+class TestEatenKcal(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.author_token = cls.getting_token(cls.author)
+        cls.product = Product.objects.create(
+            name='product',
+            weight=3,
+            unit_of_measurement='гр',
+            kcal=100,
+        )
+
+    def test_eaten_kcal_is_rounded(self):
+        client = self.getting_credentials(self.author_token)
+        for weight, kcal in ((2, 67), (1, 33), (32767, 1092233)):
+            response = client.post('/api/my_products/', data={
+                'product': self.product.id, 'weight': weight})
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+            self.assertEqual(response.data['kcal'], kcal)
+        self.assertEqual(
+            DailyKcalTotal.objects.get(user=self.author).total_kcal,
+            67 + 33 + 1092233)
+
+
+class TestDailyKcalTotal(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.author_token = cls.getting_token(cls.author)
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        cls.product = Product.objects.create(
+            name='product',
+            weight=100,
+            unit_of_measurement='гр',
+            kcal=100,
+            category=cls.category
+        )
+        cls.EATEN_PRODUCTS_PATH = '/api/my_products/'
+        cls.TOTAL_KCAL_PATH = '/api/total_kcal/'
+
+    def get_total(self):
+        return DailyKcalTotal.objects.get(user=self.author)
+
+    def test_user_with_diary_can_be_deleted(self):
+        user = User.objects.create(username='deleted')
+        user_id = user.id
+        EatenProduct.objects.create(product=self.product, weight=100,
+                                    kcal=100, user=user)
+        user.delete()
+        connection.check_constraints()
+        self.assertFalse(EatenProduct.objects.filter(user_id=user_id).exists())
+        self.assertFalse(
+            DailyKcalTotal.objects.filter(user_id=user_id).exists())
+
+    def test_total_follows_create_update_delete(self):
+        client = self.getting_credentials(self.author_token)
+        for weight in (100, 50):
+            client.post(self.EATEN_PRODUCTS_PATH,
+                        data={'product': self.product.id, 'weight': weight})
+        self.assertEqual(self.get_total().total_kcal, 150)
+        self.assertEqual(self.get_total().entries, 2)
+        eaten_product = EatenProduct.objects.filter(weight=50).get()
+        eaten_product.kcal = 70
+        eaten_product.save()
+        self.assertEqual(self.get_total().total_kcal, 170)
+        client.delete(f'{self.EATEN_PRODUCTS_PATH}{eaten_product.id}/')
+        self.assertEqual(self.get_total().total_kcal, 100)
+        response = client.get(self.TOTAL_KCAL_PATH)
+        self.assertEqual(response.data['results'], [
+            {'date': str(datetime.today().date()), 'total_kcal_for_day': 100}
+        ])
+        EatenProduct.objects.all().delete()
+        self.assertFalse(DailyKcalTotal.objects.exists())
+
+    def test_rebuild_command_restores_totals(self):
+        EatenProduct.objects.create(product=self.product, weight=100,
+                                    kcal=100, user=self.author)
+        DailyKcalTotal.objects.update(total_kcal=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_daily_totals', '--verify',
+                         stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_daily_totals', stdout=StringIO())
+        self.assertEqual(self.get_total().total_kcal, 100)
+        call_command('rebuild_daily_totals', '--verify', stdout=StringIO())
+
+
+class TestBulkCreation(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.author_token = cls.getting_token(cls.author)
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        cls.product = Product.objects.create(
+            name='product',
+            weight=100,
+            unit_of_measurement='гр',
+            kcal=100,
+            category=cls.category
+        )
+        cls.BULK_PATH = '/api/my_products/bulk/'
+
+    def test_author_can_create_meal(self):
+        client = self.getting_credentials(self.author_token)
+        response = client.post(self.BULK_PATH, format='json', data=[
+            {'product': self.product.id, 'weight': 100},
+            {'product': self.product.id, 'weight': 50},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(EatenProduct.objects.count(), 2)
+        self.assertEqual(
+            sorted(EatenProduct.objects.values_list('kcal', flat=True)),
+            [50, 100])
+        self.assertEqual(
+            DailyKcalTotal.objects.get(user=self.author).total_kcal, 150)
+
+    def test_meal_with_invalid_item_is_rejected(self):
+        client = self.getting_credentials(self.author_token)
+        response = client.post(self.BULK_PATH, format='json', data=[
+            {'product': self.product.id, 'weight': 100},
+            {'product': self.product.id + 1, 'weight': 100},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('product', response.data[1])
+        response = client.post(self.BULK_PATH, format='json', data=[
+            {'product': self.product.id, 'weight': 'много'},
+            {'product': self.product.id, 'weight': 100},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('weight', response.data[0])
+        self.assertEqual(response.data[1], {})
+        self.assertFalse(EatenProduct.objects.exists())
+
+    def test_too_large_meal_is_rejected(self):
+        client = self.getting_credentials(self.author_token)
+        response = client.post(self.BULK_PATH, format='json', data=[
+            {'product': self.product.id, 'weight': 100}
+        ] * (BULK_MAX_ITEMS + 1))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(EatenProduct.objects.exists())
+
+
+class TestCatalogCache(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        cls.product = Product.objects.create(
+            name='product',
+            weight=100,
+            unit_of_measurement='гр',
+            kcal=100,
+            category=cls.category
+        )
+        cls.PRODUCTS_PATH = '/api/products/'
+        cls.PRODUCT_PATH = f'/api/products/{cls.product.id}/'
+
+    def setUp(self):
+        cache.clear()
+        state_cache.clear()
+
+    def test_catalog_is_served_from_cache(self):
+        self.client.get(self.PRODUCTS_PATH, {'category': 'slug'})
+        self.client.get(self.PRODUCT_PATH)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.PRODUCTS_PATH,
+                                       {'category': 'slug'})
+            self.client.get(self.PRODUCT_PATH)
+        self.assertEqual(response.data['results'][0]['name'], 'product')
+
+    def test_catalog_changes_invalidate_cache(self):
+        self.client.get(self.PRODUCTS_PATH)
+        self.client.get(self.PRODUCT_PATH)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.kcal = 200
+            self.product.save()
+        response = self.client.get(self.PRODUCTS_PATH)
+        self.assertEqual(response.data['results'][0]['kcal'], 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.slug = 'new_slug'
+            self.category.save()
+        response = self.client.get(self.PRODUCT_PATH)
+        self.assertEqual(response.data['category'], 'new_slug')
+
+    @contextmanager
+    def worker(self, worker_caches):
+        response_cache, worker_state_cache = worker_caches
+        with mock.patch('api.mixins.cache', response_cache), \
+                mock.patch('calories.versions.state_cache',
+                           worker_state_cache):
+            yield
+
+    def test_changes_invalidate_cache_of_other_workers(self):
+        # Два экземпляра кешей над одними файлами ведут себя как кеши
+        # двух процессов.
+        with TemporaryDirectory() as directory:
+            first, second = ((FileBasedCache(directory, {}),
+                              SQLiteCache(Path(directory) / 'state', {}))
+                             for _ in range(2))
+            with self.worker(first):
+                self.client.get(self.PRODUCTS_PATH)
+            with self.worker(second), \
+                    self.captureOnCommitCallbacks(execute=True):
+                self.product.kcal = 200
+                self.product.save()
+            with self.worker(first):
+                response = self.client.get(self.PRODUCTS_PATH)
+        self.assertEqual(response.data['results'][0]['kcal'], 200)
+
+
+class TestProductSearch(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        for name in ('Молоко коровье', 'Мёд цветочный', 'Морковь',
+                     'Йогурт молочный'):
+            Product.objects.create(
+                name=name,
+                weight=100,
+                unit_of_measurement='гр',
+                kcal=100,
+                category=cls.category
+            )
+        cls.PRODUCTS_PATH = '/api/products/'
+        cls.AUTOCOMPLETE_PATH = '/api/products/autocomplete/'
+
+    def setUp(self):
+        cache.clear()
+        state_cache.clear()
+
+    def search(self, query):
+        response = self.client.get(self.PRODUCTS_PATH, {'search': query})
+        return [product['name'] for product in response.data['results']]
+
+    def autocomplete(self, query, **params):
+        response = self.client.get(self.AUTOCOMPLETE_PATH,
+                                   {'q': query, **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [product['name'] for product in response.data]
+
+    def test_search_folds_cyrillic_case(self):
+        self.assertEqual(self.search('МОЛО'),
+                         ['Йогурт молочный', 'Молоко коровье'])
+        self.assertEqual(self.search('мед'), ['Мёд цветочный'])
+        self.assertEqual(self.search('мо ко'), ['Молоко коровье'])
+        self.assertEqual(self.search('сыр'), [])
+
+    def test_autocomplete_returns_top_prefix_matches(self):
+        self.assertEqual(len(self.autocomplete('м')), 4)
+        self.assertEqual(len(self.autocomplete('м', limit=2)), 2)
+        self.assertEqual(self.autocomplete('МОР'), ['Морковь'])
+        self.assertEqual(self.autocomplete(''), [])
+
+    def test_search_index_follows_product_changes(self):
+        product = Product.objects.get(name='Морковь')
+        product.name = 'Свёкла'
+        product.save()
+        self.assertEqual(self.autocomplete('мор'), [])
+        self.assertEqual(self.autocomplete('свекла'), ['Свёкла'])
+        product.delete()
+        self.assertEqual(self.autocomplete('свекла'), [])
+
+
+class TestKeysetPagination(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.author_token = cls.getting_token(cls.author)
+        cls.product = Product.objects.create(
+            name='product',
+            weight=100,
+            unit_of_measurement='гр',
+            kcal=100
+        )
+        for day in (1, 1, 1, 2, 3, 3, 4):
+            eaten_product = EatenProduct.objects.create(
+                product=cls.product,
+                weight=100,
+                kcal=100,
+                user=cls.author
+            )
+            EatenProduct.objects.filter(id=eaten_product.id).update(
+                publication_date=date(2024, 1, day))
+        cls.MY_PRODUCTS_PATH = '/api/my_products/'
+
+    def setUp(self):
+        self.client = self.getting_credentials(self.author_token)
+
+    def test_pages_follow_date_and_id_order(self):
+        expected = list(EatenProduct.objects.order_by(
+            '-publication_date', '-id').values_list('id', flat=True))
+        pages = []
+        response = self.client.get(self.MY_PRODUCTS_PATH, {'page_size': 3})
+        while True:
+            pages.append([item['id'] for item in response.data['results']])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual([id for page in pages for id in page], expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         pages[1])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         pages[0])
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_number_mode_is_opt_in(self):
+        response = self.client.get(self.MY_PRODUCTS_PATH,
+                                   {'page': 2, 'page_size': 5})
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(self.MY_PRODUCTS_PATH,
+                                   {'cursor': 'broken'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TestTotalKcalSummary(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.author_token = cls.getting_token(cls.author)
+        cls.fruits = Category.objects.create(name='Фрукты', slug='fruits')
+        cls.drinks = Category.objects.create(name='Напитки', slug='drinks')
+        for day, kcal, category in ((1, 100, cls.fruits),
+                                    (1, 50, cls.drinks),
+                                    (3, 300, cls.fruits),
+                                    (8, 40, None),
+                                    (31, 10, cls.drinks)):
+            product = Product.objects.create(
+                name=f'product{day}{kcal}',
+                weight=100,
+                unit_of_measurement='гр',
+                kcal=kcal,
+                category=category
+            )
+            eaten_product = EatenProduct.objects.create(
+                product=product,
+                weight=100,
+                kcal=kcal,
+                category=category,
+                user=cls.author
+            )
+            EatenProduct.objects.filter(id=eaten_product.id).update(
+                publication_date=date(2024, 1, day))
+        cls.SUMMARY_PATH = '/api/total_kcal/summary/'
+
+    def setUp(self):
+        self.client = self.getting_credentials(self.author_token)
+        category_registry.refresh()
+
+    def test_week_buckets(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.SUMMARY_PATH, {
+                'from': '2024-01-01', 'to': '2024-01-31',
+                'bucket': 'week'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data['total_kcal'], 500)
+        self.assertEqual(response.data['days'], 4)
+        self.assertEqual(response.data['average_kcal'], 125)
+        self.assertEqual(response.data['max_day'],
+                         {'date': date(2024, 1, 3), 'total_kcal': 300})
+        first_week, second_week, last_week = response.data['buckets']
+        self.assertEqual(first_week['start'], date(2024, 1, 1))
+        self.assertEqual(first_week['end'], date(2024, 1, 7))
+        self.assertEqual(first_week['total_kcal'], 450)
+        self.assertEqual(first_week['min_day'],
+                         {'date': date(2024, 1, 1), 'total_kcal': 150})
+        self.assertEqual(first_week['categories'], [
+            {'category': 'fruits', 'total_kcal': 400},
+            {'category': 'drinks', 'total_kcal': 50},
+        ])
+        self.assertEqual(second_week['categories'],
+                         [{'category': None, 'total_kcal': 40}])
+        self.assertEqual(last_week['start'], date(2024, 1, 29))
+
+    def test_month_bucket_and_validation(self):
+        response = self.client.get(self.SUMMARY_PATH, {
+            'from': '2024-01-02', 'to': '2024-02-29', 'bucket': 'month'})
+        self.assertEqual(len(response.data['buckets']), 1)
+        self.assertEqual(response.data['buckets'][0]['end'],
+                         date(2024, 1, 31))
+        self.assertEqual(response.data['total_kcal'], 350)
+        response = self.client.get(self.SUMMARY_PATH, {
+            'from': '2024-02-01', 'to': '2024-01-01'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.get(self.SUMMARY_PATH, {'bucket': 'year'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class TestImportCatalog(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        Product.objects.create(
+            name='Молоко',
+            weight=100,
+            unit_of_measurement='мл',
+            kcal=60,
+            category=cls.category
+        )
+
+    def import_file(self, suffix, content):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / f'catalog{suffix}'
+            path.write_text(content, encoding='utf-8')
+            stderr = StringIO()
+            call_command('import_catalog', str(path), '--batch-size', '2',
+                         stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_csv_import_upserts_by_name(self):
+        errors = self.import_file('.csv', (
+            'name,weight,unit_of_measurement,kcal,category\n'
+            'Молоко,100,мл,52,slug\n'
+            'Хлеб,100,гр,250,slug\n'
+            'Сыр,100,кг,350,slug\n'
+            'Вода,250,мл,0,\n'
+        ))
+        self.assertIn('Строка 4', errors)
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(name='Молоко').kcal, 52)
+        self.assertEqual(Product.objects.get(name='Хлеб').category,
+                         self.category)
+        self.assertIsNone(Product.objects.get(name='Вода').category)
+
+    def test_jsonl_import_reports_rejected_rows(self):
+        errors = self.import_file('.jsonl', '\n'.join((
+            json.dumps({'name': 'Хлеб', 'weight': 100, 'kcal': 250,
+                        'unit_of_measurement': 'гр', 'category': 'slug'}),
+            '{broken',
+            json.dumps({'name': 'Сыр', 'weight': 100, 'kcal': 'много',
+                        'unit_of_measurement': 'гр', 'category': 'slug'}),
+            json.dumps({'name': 'Мед', 'weight': 100, 'kcal': 300,
+                        'unit_of_measurement': 'гр', 'category': 'none'}),
+        )))
+        self.assertEqual(errors.count('Строка'), 3)
+        self.assertEqual(
+            list(Product.objects.values_list('name', flat=True)),
+            ['Молоко', 'Хлеб'])
+
+
+class TestExport(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.author_token = cls.getting_token(cls.author)
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        cls.product = Product.objects.create(
+            name='Молоко',
+            weight=100,
+            unit_of_measurement='мл',
+            kcal=60,
+            category=cls.category
+        )
+        for weight in (100, 200):
+            EatenProduct.objects.create(
+                product=cls.product,
+                weight=weight,
+                kcal=weight * 0.6,
+                unit_of_measurement='мл',
+                category=cls.category,
+                user=cls.author
+            )
+        cls.EXPORT_PATH = '/api/my_products/export/'
+
+    def export(self, export_format):
+        client = self.getting_credentials(self.author_token)
+        response = client.get(self.EXPORT_PATH, {'format': export_format})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        lines = self.export('csv').splitlines()
+        self.assertEqual(lines[0], ('id,publication_date,product,category,'
+                                    'weight,unit_of_measurement,kcal'))
+        self.assertEqual(len(lines), 3)
+        self.assertIn('Молоко,slug,200,мл,120', lines[1])
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line)
+                for line in self.export('ndjson').splitlines()]
+        self.assertEqual([row['weight'] for row in rows], [200, 100])
+        self.assertEqual(rows[0]['product'], 'Молоко')
+        self.assertEqual(rows[0]['publication_date'],
+                         str(datetime.today().date()))
+
+    def test_anonymous_user_cant_export(self):
+        response = self.client.get(self.EXPORT_PATH, {'format': 'csv'})
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+    async def test_export_under_asgi(self):
+        # ASGIHandler перебирает ответ в цикле событий, где ORM запрещен.
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request'}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': self.EXPORT_PATH,
+            'query_string': b'format=csv',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization',
+                 self.author_token['HTTP_AUTHORIZATION'].encode()),
+            ],
+        }
+        request_started.disconnect(close_old_connections)
+        try:
+            await ASGIHandler()(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+        self.assertEqual(messages[0]['status'], HTTPStatus.OK)
+        lines = b''.join(
+            message.get('body', b'') for message in messages[1:]
+        ).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+
+class TestDiaryChanges(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.another_user = User.objects.create(username='another_user')
+        cls.product = Product.objects.create(
+            name='Молоко',
+            weight=100,
+            unit_of_measurement='мл',
+            kcal=60
+        )
+        cls.eaten_products = [
+            EatenProduct.objects.create(
+                product=cls.product,
+                weight=weight,
+                kcal=weight * 0.6,
+                unit_of_measurement='мл',
+                user=cls.author
+            ) for weight in (100, 200, 300)
+        ]
+        cls.CHANGES_PATH = '/api/my_products/changes/'
+
+    def setUp(self):
+        self.client = self.getting_credentials(
+            self.getting_token(self.author))
+
+    def sync(self, token=None):
+        response = self.client.get(self.CHANGES_PATH,
+                                   {} if token is None else {'since': token})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.data
+
+    def test_first_sync_returns_whole_diary(self):
+        changes = self.sync()
+        self.assertTrue(changes['reset'])
+        self.assertEqual([row['id'] for row in changes['changed']],
+                         [eaten.id for eaten in self.eaten_products])
+        self.assertEqual(self.sync(changes['token'])['changed'], [])
+        self.assertTrue(self.sync('unknown:1')['reset'])
+
+    def test_sync_returns_only_changes_since_token(self):
+        token = self.sync()['token']
+        updated, deleted, _ = self.eaten_products
+        self.client.patch(f'/api/my_products/{updated.id}/',
+                          {'weight': 150}, format='json')
+        self.client.delete(f'/api/my_products/{deleted.id}/')
+        self.client.post('/api/my_products/bulk/',
+                         [{'product': self.product.id, 'weight': 10}],
+                         format='json')
+        EatenProduct.objects.create(product=self.product, weight=10, kcal=6,
+                                    user=self.another_user)
+        changes = self.sync(token)
+        self.assertFalse(changes['reset'])
+        self.assertEqual(changes['deleted'], [deleted.id])
+        self.assertEqual([row['weight'] for row in changes['changed']],
+                         [150, 10])
+        self.assertEqual(self.sync(changes['token'])['changed'], [])
+
+    def test_reset_is_paged(self):
+        def sync(token):
+            return diary_changes(self.author.id, token,
+                                 EatenProduct.objects.for_user(
+                                     self.author.id), limit=2)
+
+        first, second, third = self.eaten_products
+        first_id = first.id
+        changes = sync(None)
+        self.assertTrue(changes['reset'])
+        self.assertTrue(changes['has_more'])
+        self.assertEqual(changes['changed'], [first, second])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            added = EatenProduct.objects.create(
+                product=self.product, weight=10, kcal=6, user=self.author)
+        changes = sync(changes['token'])
+        self.assertFalse(changes['reset'])
+        self.assertFalse(changes['has_more'])
+        self.assertEqual(changes['changed'], [third, added])
+        changes = sync(changes['token'])
+        self.assertEqual(changes['deleted'], [first_id])
+        self.assertEqual(changes['changed'], [added])
+
+    def test_change_log_requires_sqlite(self):
+        schema_editor = mock.Mock()
+        schema_editor.connection.vendor = 'postgresql'
+        with self.assertRaises(NotSupportedError):
+            import_module(
+                'calories.migrations.0010_eaten_product_changes'
+            ).create_change_triggers(None, schema_editor)
+        schema_editor.execute.assert_not_called()
+
+    def test_deleted_product_leaves_tombstones(self):
+        token = self.sync()['token']
+        self.product.delete()
+        changes = self.sync(token)
+        self.assertEqual(sorted(changes['deleted']),
+                         [eaten.id for eaten in self.eaten_products])
+        self.assertEqual(changes['changed'], [])
+
+
+class TestClaimsAuthentication(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin',
+                                             password='password',
+                                             is_staff=True)
+        cls.author = User.objects.create_user(username='author',
+                                              password='password')
+
+    def setUp(self):
+        # Версии токенов в кеше не откатываются вместе с транзакцией теста.
+        state_cache.clear()
+
+    def get_access_token(self, username):
+        response = self.client.post('/api/auth/jwt/create/', {
+            'username': username, 'password': 'password'})
+        return response.data['access']
+
+    def test_token_carries_staff_claim(self):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.get_access_token("author")}')
+        response = client.get('/api/categories/')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.get_access_token("admin")}')
+        response = client.get('/api/categories/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_revoked_staff_is_checked_against_database(self):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.get_access_token("admin")}')
+        User.objects.filter(id=self.admin.id).update(is_staff=False)
+        response = client.get('/api/categories/')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def diary_status(self, client):
+        return client.get('/api/my_products/').status_code
+
+    def author_client(self):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.get_access_token("author")}')
+        return client
+
+    def test_deactivated_user_tokens_are_revoked(self):
+        client = self.author_client()
+        self.assertEqual(self.diary_status(client), HTTPStatus.OK)
+        self.author.is_active = False
+        self.author.save()
+        self.assertEqual(self.diary_status(client), HTTPStatus.UNAUTHORIZED)
+
+    def test_deleted_user_tokens_are_revoked(self):
+        client = self.author_client()
+        self.assertEqual(self.diary_status(client), HTTPStatus.OK)
+        self.author.delete()
+        self.assertEqual(self.diary_status(client), HTTPStatus.UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        client = self.author_client()
+        self.author.set_password('new_password')
+        self.author.save()
+        self.assertEqual(self.diary_status(client), HTTPStatus.UNAUTHORIZED)
+        response = self.client.post('/api/auth/jwt/create/', {
+            'username': 'author', 'password': 'new_password'})
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.diary_status(client), HTTPStatus.OK)
+
+    def test_tokens_without_version_claims_are_checked_against_database(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=(
+            f'Bearer {RefreshToken.for_user(self.author).access_token}'))
+        self.assertEqual(self.diary_status(client), HTTPStatus.OK)
+        User.objects.filter(id=self.author.id).update(is_active=False)
+        self.assertEqual(self.diary_status(client), HTTPStatus.UNAUTHORIZED)
+
+    def test_database_is_checked_when_version_is_not_cached(self):
+        client = self.author_client()
+        self.assertEqual(self.diary_status(client), HTTPStatus.OK)
+        User.objects.filter(id=self.author.id).update(is_active=False)
+        self.assertEqual(self.diary_status(client), HTTPStatus.OK)
+        state_cache.clear()
+        self.assertEqual(self.diary_status(client), HTTPStatus.UNAUTHORIZED)
+
+
+class TestSeedLoad(TestCase):
+
+    def test_seed_load_generates_consistent_data(self):
+        call_command('seed_load', '--categories', '2', '--products', '10',
+                     '--users', '3', '--entries', '50', '--days', '30',
+                     '--batch-size', '20', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(EatenProduct.objects.count(), 50)
+        self.assertGreater(
+            EatenProduct.objects.values('publication_date')
+            .distinct().count(), 1)
+        call_command('rebuild_daily_totals', '--verify', stdout=StringIO())
+
+
+class TestConditionalGet(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.category = Category.objects.create(name='category', slug='slug')
+        cls.product = Product.objects.create(
+            name='product',
+            weight=100,
+            unit_of_measurement='гр',
+            kcal=100,
+            category=cls.category
+        )
+        cls.PRODUCTS_PATH = '/api/products/'
+        cls.TOTAL_KCAL_PATH = '/api/total_kcal/'
+
+    def setUp(self):
+        cache.clear()
+        state_cache.clear()
+        self.author_client = self.getting_credentials(
+            self.getting_token(self.author))
+        self.reader_client = self.getting_credentials(
+            self.getting_token(self.reader))
+
+    def eat(self, client):
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post('/api/my_products/',
+                        data={'product': self.product.id, 'weight': 50})
+
+    def test_unchanged_catalog_returns_not_modified_without_queries(self):
+        response = self.client.get(self.PRODUCTS_PATH)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.PRODUCTS_PATH,
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(self.PRODUCTS_PATH,
+                                   HTTP_IF_MODIFIED_SINCE=(
+                                       response['Last-Modified']))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.kcal = 200
+            self.product.save()
+        response = self.client.get(self.PRODUCTS_PATH,
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query(self):
+        self.assertNotEqual(
+            self.client.get(self.PRODUCTS_PATH)['ETag'],
+            self.client.get(self.PRODUCTS_PATH,
+                            {'category': 'slug'})['ETag'])
+
+    def test_daily_totals_follow_own_diary(self):
+        self.eat(self.author_client)
+        etag = self.author_client.get(self.TOTAL_KCAL_PATH)['ETag']
+        self.eat(self.reader_client)
+        response = self.author_client.get(self.TOTAL_KCAL_PATH,
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.eat(self.author_client)
+        response = self.author_client.get(self.TOTAL_KCAL_PATH,
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data['results'][0]['total_kcal_for_day'],
+                         100)
+
+    def test_default_summary_window_moves_after_midnight(self):
+        path = '/api/total_kcal/summary/'
+        now = date.today()
+        tomorrow = now + timedelta(days=1)
+        with mock.patch('api.serializers.date', wraps=date) as today:
+            today.today.return_value = now
+            response = self.author_client.get(path)
+            today.today.return_value = tomorrow
+            for header in ({'HTTP_IF_NONE_MATCH': response['ETag']},
+                           {'HTTP_IF_MODIFIED_SINCE':
+                            response['Last-Modified']}):
+                next_day = self.author_client.get(path, **header)
+                self.assertEqual(next_day.status_code, HTTPStatus.OK)
+                self.assertEqual(next_day.data['to'], tomorrow)
+
+    def test_users_get_different_etags(self):
+        self.assertNotEqual(
+            self.author_client.get(self.TOTAL_KCAL_PATH)['ETag'],
+            self.reader_client.get(self.TOTAL_KCAL_PATH)['ETag'])
+
+
+class TestCategoryRegistry(APITestCase, UserCredentials):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.category = Category.objects.create(name='category', slug='slug')
+        cls.PRODUCTS_PATH = '/api/products/'
+
+    def setUp(self):
+        self.client = self.getting_credentials(
+            self.getting_token(self.admin))
+        category_registry.refresh()
+
+    def test_product_write_resolves_slug_without_query(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.PRODUCTS_PATH, data={
+                'name': 'product', 'weight': 100, 'kcal': 100,
+                'unit_of_measurement': 'гр', 'category': 'slug'})
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.data['category'], 'slug')
+        self.assertEqual(Product.objects.get().category, self.category)
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT')
+            and 'calories_category' in query['sql']
+            for query in context.captured_queries))
+
+    def test_unknown_slug_is_rejected(self):
+        response = self.client.post(self.PRODUCTS_PATH, data={
+            'name': 'product', 'weight': 100, 'kcal': 100,
+            'unit_of_measurement': 'гр', 'category': 'missing'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('category', response.data)
+
+    def test_registry_follows_changes_from_other_processes(self):
+        Category.objects.filter(id=self.category.id).update(slug='renamed')
+        self.assertEqual(category_registry.id_for('slug'), self.category.id)
+        bump_version(CATEGORY_VERSION)
+        self.assertIsNone(category_registry.id_for('slug'))
+        self.assertEqual(category_registry.id_for('renamed'),
+                         self.category.id)
+
+    def test_missing_slug_falls_back_to_database(self):
+        # Категория другого процесса, версия которой еще не видна.
+        Category.objects.bulk_create([Category(name='new', slug='new')])
+        category = Category.objects.get(slug='new')
+        with self.assertNumQueries(1):
+            self.assertEqual(category_registry.get('new'), category)
+        self.assertEqual(category_registry.slugs()[category.id], 'new')
+        with self.assertNumQueries(1):
+            self.assertIsNone(category_registry.id_for('missing'))
+
+    def test_signals_refresh_registry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='new', slug='new')
+        self.assertEqual(category_registry.id_for('new'), category.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            category.delete()
+        self.assertIsNone(category_registry.id_for('new'))
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.authentication import ClaimsRefreshToken
+from api.metrics import MetricsMiddleware, current_stats, registry
+from calories.models import Category, EatenProduct, Product
+
+User = get_user_model()
+
+METRICS_TOKEN = 'metrics-token'
+
+
+@override_settings(METRICS_TOKEN=METRICS_TOKEN)
+class TestMetrics(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Фрукты', slug='fruits')
+        cls.product = Product.objects.create(
+            name='Яблоко', weight=100, kcal=52, unit_of_measurement='г',
+            category=category)
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.author = User.objects.create(username='author')
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+
+    def get_metrics(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def get_metric(self, text, name, route):
+        prefix = f'{name}{{route="{route}"}} '
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        self.fail(f'{prefix} нет в выводе')
+
+    def test_route_metrics_are_exposed(self):
+        for _ in range(2):
+            self.client.get(reverse('products-list'))
+        text = self.get_metrics()
+        self.assertIn('http_request_duration_seconds_bucket'
+                      '{route="products-list",le="+Inf"} 2', text)
+        self.assertEqual(self.get_metric(
+            text, 'http_request_duration_seconds_count', 'products-list'), 2)
+        self.assertGreater(self.get_metric(
+            text, 'http_request_db_queries_total', 'products-list'), 0)
+        self.assertGreater(self.get_metric(
+            text, 'http_request_serializer_seconds_total', 'products-list'),
+            0)
+        self.assertGreater(self.get_metric(
+            text, 'http_response_bytes_total', 'products-list'), 0)
+
+    def test_unmatched_route(self):
+        self.client.get('/missing/')
+        self.assertEqual(self.get_metric(
+            registry.render(), 'http_request_duration_seconds_count',
+            'unmatched'), 1)
+
+    def test_metrics_require_staff_or_token(self):
+        path = reverse('metrics')
+        self.assertEqual(self.client.get(path).status_code, 403)
+        self.assertEqual(self.client.get(
+            path, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(
+                path, HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(path).status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_streamed_response_bytes_are_counted(self):
+        EatenProduct.objects.create(product=self.product, weight=100,
+                                    kcal=52, user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=(
+            f'Bearer {ClaimsRefreshToken.for_user(self.author).access_token}'
+        ))
+        response = self.client.get('/api/my_products/export/',
+                                   {'format': 'csv'})
+        content = b''.join(response.streaming_content)
+        self.client.credentials()
+        self.assertEqual(self.get_metric(
+            self.get_metrics(), 'http_response_bytes_total',
+            'my_products-export'), len(content))
+
+    def test_middleware_passes_response_through(self):
+        response = HttpResponse(b'body')
+        requests = []
+
+        def get_response(request):
+            requests.append(request)
+            self.assertIsNotNone(current_stats.get())
+            return response
+
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(0):
+            self.assertIs(MetricsMiddleware(get_response)(request),
+                          response)
+        self.assertEqual(requests, [request])
+        self.assertIsNone(current_stats.get())
+        text = registry.render()
+        self.assertEqual(self.get_metric(
+            text, 'http_request_duration_seconds_count', 'unmatched'), 1)
+        self.assertEqual(self.get_metric(
+            text, 'http_response_bytes_total', 'unmatched'), 4)
+        self.assertEqual(self.get_metric(
+            text, 'http_request_db_queries_total', 'unmatched'), 0)
@@ -0,0 +1,111 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.authentication import ClaimsRefreshToken
+from api.profiling import PROFILE_ID_HEADER
+
+User = get_user_model()
+
+
+class TestProfiler(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username='admin', is_staff=True)
+        cls.user = User.objects.create(username='user')
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings = {
+            'ENABLED': True,
+            'DIRECTORY': Path(self.directory.name),
+            'SAMPLE_RATE': 0,
+        }
+
+    def get_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer '
+                           f'{ClaimsRefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_staff_request_is_profiled(self):
+        with override_settings(PROFILER=self.settings):
+            response = self.get_client(self.staff).get(
+                reverse('total_kcal-list'), HTTP_X_PROFILE='1')
+        profile_id = response[PROFILE_ID_HEADER]
+        self.assertIn('total_kcal-list', profile_id)
+        directory = Path(self.directory.name)
+        self.assertTrue((directory / f'{profile_id}.prof').is_file())
+        self.assertIn('calories_dailykcaltotal', (
+            directory / f'{profile_id}.sql').read_text(encoding='utf-8'))
+
+    def test_profile_list_is_for_staff_only(self):
+        with override_settings(PROFILER=self.settings):
+            profile_id = self.get_client(self.staff).get(
+                reverse('total_kcal-list'), {'profile': ''}
+            )[PROFILE_ID_HEADER]
+            client = APIClient()
+            client.force_login(self.user)
+            self.assertEqual(
+                client.get(reverse('profiles')).status_code, 302)
+            client.force_login(self.staff)
+            response = client.get(reverse('profiles'))
+            self.assertContains(response, profile_id)
+            response = client.get(
+                reverse('profile-file', args=(f'{profile_id}.sql',)))
+            self.assertEqual(response.status_code, 200)
+
+    def test_non_staff_request_is_not_profiled(self):
+        with override_settings(PROFILER=self.settings):
+            response = self.get_client(self.user).get(
+                reverse('total_kcal-list'), HTTP_X_PROFILE='1')
+        self.assertNotIn(PROFILE_ID_HEADER, response)
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [])
+
+    def test_sampling(self):
+        self.settings['SAMPLE_RATE'] = 1
+        with override_settings(PROFILER=self.settings):
+            response = self.get_client(self.user).get(
+                reverse('total_kcal-list'))
+        self.assertIn(PROFILE_ID_HEADER, response)
+
+    def test_query_params_are_not_saved(self):
+        self.settings['SAMPLE_RATE'] = 1
+        with override_settings(PROFILER=self.settings):
+            response = APIClient().post(reverse('jwt-create'), {
+                'username': 'user', 'password': 'secret-password'})
+        sql = (Path(self.directory.name)
+               / f'{response[PROFILE_ID_HEADER]}.sql').read_text(
+                   encoding='utf-8')
+        self.assertIn('auth_user', sql)
+        self.assertNotIn("'user'", sql)
+        self.assertNotIn('secret-password', sql)
+
+    def test_old_profiles_are_pruned(self):
+        self.settings['SAMPLE_RATE'] = 1
+        client = self.get_client(self.user)
+        with override_settings(PROFILER=self.settings), \
+                mock.patch('api.profiling.MAX_PROFILES', 2):
+            profile_ids = [
+                client.get(reverse('total_kcal-list'))[PROFILE_ID_HEADER]
+                for _ in range(3)
+            ]
+        names = {path.name for path in Path(self.directory.name).iterdir()}
+        self.assertEqual(len(names), 4)
+        self.assertEqual(
+            {name.rsplit('.', 1)[0] for name in names},
+            set(profile_ids[1:]))
+
+    def test_disabled_profiler(self):
+        self.settings['ENABLED'] = False
+        with override_settings(PROFILER=self.settings):
+            response = self.get_client(self.staff).get(
+                reverse('total_kcal-list'), HTTP_X_PROFILE='1')
+        self.assertNotIn(PROFILE_ID_HEADER, response)
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+
+from api.authentication import ClaimsRefreshToken
+from calories.models import Category, DailyKcalTotal, EatenProduct, Product
+from calories.registry import category_registry
+
+
+User = get_user_model()
+
+
+class TestQueryCount(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.category = Category.objects.create(
+            name='category',
+            slug='slug'
+        )
+        cls.products = [
+            Product.objects.create(
+                name=f'product{number}',
+                weight=100,
+                unit_of_measurement='гр',
+                kcal=100,
+                category=cls.category
+            ) for number in range(5)
+        ]
+        cls.MY_PRODUCTS_PATH = '/api/my_products/'
+
+    def setUp(self):
+        category_registry.refresh()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=(
+                f'Bearer '
+                f'{ClaimsRefreshToken.for_user(self.author).access_token}'
+            )
+        )
+
+    def create_eaten_products(self, products):
+        for product in products:
+            EatenProduct.objects.create(
+                product=product,
+                weight=100,
+                kcal=100,
+                category=self.category,
+                user=self.author
+            )
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self.create_eaten_products(self.products[:1])
+        single_row_queries = self.count_queries(self.MY_PRODUCTS_PATH)
+        self.create_eaten_products(self.products[1:])
+        full_page_queries = self.count_queries(self.MY_PRODUCTS_PATH)
+        self.assertEqual(single_row_queries, full_page_queries)
+
+    def test_deep_pages_cost_the_same_as_first_page(self):
+        self.create_eaten_products(self.products * 4)
+        path = f'{self.MY_PRODUCTS_PATH}?page_size=2'
+        first_page_queries = self.count_queries(path)
+        for _ in range(5):
+            path = self.client.get(path).data['next']
+        self.assertEqual(self.count_queries(path), first_page_queries)
+
+    def test_detail_resolves_product_without_extra_query(self):
+        self.create_eaten_products(self.products[:1])
+        eaten_product = EatenProduct.objects.get()
+        path = f'{self.MY_PRODUCTS_PATH}{eaten_product.id}/'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.data['product'], self.products[0].name)
+        self.assertEqual(response.data['category'], self.category.slug)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_token_claims_replace_user_lookup(self):
+        self.create_eaten_products(self.products[:1])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/total_kcal/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('auth_user', context.captured_queries[0]['sql'])
+
+    def test_create_reads_product_once(self):
+        self.create_eaten_products(self.products[:1])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                self.MY_PRODUCTS_PATH,
+                data={'product': self.products[0].id, 'weight': 50},
+                format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['category'], self.category.slug)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        # Продукт с категорией, вставка и итог за день.
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(queries[0].startswith('SELECT'))
+        self.assertTrue(queries[1].startswith('INSERT'))
+
+    def test_category_filter_does_not_join_categories(self):
+        self.create_eaten_products(self.products[:1])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.MY_PRODUCTS_PATH,
+                                       {'category': self.category.slug})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['category'],
+                         self.category.slug)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('calories_category',
+                         context.captured_queries[0]['sql'])
+
+    def test_bulk_create_meal_costs_three_queries(self):
+        # Первый прием пищи за день: итога за день еще нет.
+        meal = [
+            {'product': product.id, 'weight': 50}
+            for product in self.products
+        ] * 4
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f'{self.MY_PRODUCTS_PATH}bulk/',
+                                        data=meal, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), len(meal))
+        self.assertEqual(response.data[0]['product'], self.products[0].name)
+        queries = [
+            query for query in context.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        # Продукты, вставка и итог за день.
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(
+            [item['id'] for item in response.data],
+            list(EatenProduct.objects.order_by('id').values_list(
+                'id', flat=True)))
+        self.assertEqual(
+            DailyKcalTotal.objects.get().total_kcal,
+            sum(item['kcal'] for item in response.data))
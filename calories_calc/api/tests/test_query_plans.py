@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.views import (CategoryViewSet, EatenProductViewSet, ProductViewSet,
+                       TotalKcalViewSet)
+from calories.models import (Category, EatenProduct, EatenProductChange,
+                             Product)
+
+
+User = get_user_model()
+
+DIARY_TABLES = ('calories_eatenproduct', 'calories_dailykcaltotal')
+
+
+class TestQueryPlans(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # На одной строке SQLite выбирает тот же план, что и на пустой
+        # таблице, поэтому данных несколько пользователей и категорий.
+        users = [User.objects.create(username=f'user{number}')
+                 for number in range(5)]
+        cls.author = users[0]
+        categories = [
+            Category.objects.create(name=f'category{number}',
+                                    slug=f'slug{number}')
+            for number in range(5)
+        ]
+        cls.category = categories[0]
+        products = [
+            Product.objects.create(
+                name=f'product{number}', weight=100,
+                unit_of_measurement='гр', kcal=100,
+                category=categories[number % len(categories)])
+            for number in range(20)
+        ]
+        EatenProduct.objects.bulk_create(
+            EatenProduct(product=product, weight=100, kcal=100,
+                         category=product.category, user=user)
+            for user in users for product in products[:10])
+
+    def get_queryset(self, viewset_class, query_params=None):
+        request = Request(APIRequestFactory().get('/', query_params))
+        request.user = self.author
+        view = viewset_class(request=request, action='list',
+                             format_kwarg=None, kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def assert_plan_uses_indexes(self, queryset, scanned_tables=(),
+                                 sorted_by_index=True):
+        plan = queryset[:5].explain()
+        for line in plan.splitlines():
+            with self.subTest(line=line):
+                if sorted_by_index:
+                    self.assertNotIn('TEMP B-TREE', line)
+                if 'SCAN' in line:
+                    self.assertFalse(
+                        set(scanned_tables).intersection(line.split()),
+                        plan)
+
+    def test_diary_querysets_use_indexes(self):
+        params = (
+            None,
+            {'publication_date': '2024-01-01'},
+            {'category': 'slug0'},
+            {'category': 'slug0', 'publication_date': '2024-01-01'},
+            {'search': 'product'},
+        )
+        for query_params in params:
+            with self.subTest(query_params=query_params):
+                self.assert_plan_uses_indexes(
+                    self.get_queryset(EatenProductViewSet, query_params),
+                    DIARY_TABLES)
+
+    def test_diary_changes_use_index(self):
+        self.assert_plan_uses_indexes(
+            EatenProductChange.objects.for_user(self.author.id).filter(
+                id__gt=0).order_by('id'), ('calories_eatenproductchange',))
+
+    def test_total_kcal_queryset_uses_indexes(self):
+        self.assert_plan_uses_indexes(
+            self.get_queryset(TotalKcalViewSet), DIARY_TABLES)
+
+    def test_product_queryset_is_sorted_by_index(self):
+        for query_params in (None, {'category': 'slug0'}):
+            with self.subTest(query_params=query_params):
+                self.assert_plan_uses_indexes(
+                    self.get_queryset(ProductViewSet, query_params))
+
+    def test_product_search_uses_fts_index(self):
+        # Найденные продукты сортируются в памяти, но каталог целиком
+        # не читается.
+        self.assert_plan_uses_indexes(
+            self.get_queryset(ProductViewSet, {'search': 'product'}),
+            ('calories_product',),
+            sorted_by_index=False)
+
+    def test_category_queryset_is_sorted_by_index(self):
+        self.assert_plan_uses_indexes(self.get_queryset(CategoryViewSet))
+
+    def test_keyset_pages_use_indexes(self):
+        for viewset_class in (EatenProductViewSet, TotalKcalViewSet):
+            paginator = viewset_class.pagination_class()
+            queryset = self.get_queryset(viewset_class)
+            for reverse in (False, True):
+                ordering = (f'-{paginator.date_field}', '-id')
+                if reverse:
+                    ordering = (paginator.date_field, 'id')
+                with self.subTest(viewset=viewset_class, reverse=reverse):
+                    self.assert_plan_uses_indexes(
+                        queryset.order_by(*ordering).filter(
+                            paginator.get_position_filter(
+                                '2024-01-01', 1, reverse)),
+                        DIARY_TABLES)
@@ -0,0 +1,162 @@
+from io import StringIO
+from pathlib import Path
+import sqlite3
+from tempfile import TemporaryDirectory
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, router
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient, APITestCase
+
+from api.authentication import ClaimsRefreshToken
+from calories.constants import (CATALOG_VERSION, DIARY_VERSION,
+                                PRIMARY_READS_CACHE_PREFIX)
+from calories.models import EatenProduct, Product
+from calories.registry import category_registry
+from calories.routers import (mark_replicas_refreshed, replica_reads,
+                              replicas_refreshed_at)
+from calories.versions import (bump_version, get_versions, state_cache,
+                               user_diary_version)
+
+
+User = get_user_model()
+
+REPLICA = 'replica_0'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class TestReplicaReads(APITestCase):
+
+    # Реплика в памяти отстает от основной базы, поэтому по ответу видно,
+    # откуда прочитаны данные.
+    def setUp(self):
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+        connections.ensure_defaults(REPLICA)
+        connections.prepare_test_settings(REPLICA)
+        self.addCleanup(self.remove_replica)
+        with override_settings(DATABASE_REPLICAS=[]):
+            call_command('migrate', database=REPLICA, verbosity=0)
+        cache.clear()
+        state_cache.clear()
+        category_registry.refresh()
+        self.mark_refreshed()
+
+    def mark_refreshed(self):
+        # Пустая реплика считается скопированной после всех изменений.
+        get_versions((CATALOG_VERSION, DIARY_VERSION, *(
+            user_diary_version(user.id)
+            for user in (self.user, self.another_user))))
+        mark_replicas_refreshed(time.time())
+
+    def remove_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        cls.another_user = User.objects.create(username='another_user')
+        cls.product = Product.objects.create(
+            name='product', weight=100, unit_of_measurement='гр', kcal=100)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=(
+            f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'))
+        return client
+
+    def eat(self, client):
+        response = client.post('/api/my_products/',
+                               {'product': self.product.id, 'weight': 50},
+                               format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_reads_go_to_replica_only_inside_requests(self):
+        self.assertEqual(router.db_for_read(Product), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), REPLICA)
+            self.assertEqual(router.db_for_write(Product), 'default')
+            replica_product = Product.objects.using(REPLICA).create(
+                name='replica', weight=1, unit_of_measurement='гр', kcal=1)
+            self.assertEqual(
+                router.db_for_write(Product, instance=replica_product),
+                'default')
+
+    def test_diary_list_reads_replica_until_user_writes(self):
+        for user in (self.user, self.another_user):
+            EatenProduct.objects.create(product=self.product, weight=100,
+                                        kcal=100, user=user)
+        self.mark_refreshed()
+        client = self.client_for(self.user)
+        self.assertEqual(client.get('/api/my_products/').data['results'], [])
+        self.eat(client)
+        self.assertEqual(
+            len(client.get('/api/my_products/').data['results']), 2)
+        self.assertEqual(len(client.get('/api/total_kcal/').data['results']),
+                         1)
+        self.assertEqual(self.client_for(self.another_user).get(
+            '/api/my_products/').data['results'], [])
+
+    def test_writes_pin_user_to_primary_only_with_replicas(self):
+        client = self.client_for(self.user)
+        with mock.patch('calories.routers.state_cache') as pins:
+            self.eat(client)
+        pins.set.assert_called_once_with(
+            f'{PRIMARY_READS_CACHE_PREFIX}:{self.user.id}', mock.ANY,
+            settings.USER_STATE_TIMEOUT)
+        with override_settings(DATABASE_REPLICAS=[]), \
+                mock.patch('calories.routers.state_cache') as pins:
+            self.eat(client)
+        pins.set.assert_not_called()
+
+    def test_catalog_changed_after_copy_is_read_from_primary(self):
+        client = self.client_for(self.user)
+        self.assertEqual(client.get('/api/products/').data['results'], [])
+        bump_version(CATALOG_VERSION)
+        self.assertEqual(len(client.get('/api/products/').data['results']),
+                         1)
+
+    def test_primary_is_read_until_replicas_are_copied(self):
+        state_cache.clear()
+        self.assertEqual(len(self.client_for(self.user).get(
+            '/api/products/').data['results']), 1)
+
+
+# Копирование через backup API ждет завершения транзакции TestCase.
+class TestRefreshReplicas(TransactionTestCase):
+
+    def test_refresh_replicas_copies_primary(self):
+        Product.objects.create(name='product', weight=100,
+                               unit_of_measurement='гр', kcal=100)
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'replica.sqlite3'
+            connections.databases[REPLICA] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': path,
+            }
+            connections.ensure_defaults(REPLICA)
+            connections.prepare_test_settings(REPLICA)
+            started = time.time()
+            try:
+                with override_settings(DATABASE_REPLICAS=[REPLICA]):
+                    call_command('refresh_replicas', stdout=StringIO())
+            finally:
+                del connections[REPLICA]
+                del connections.databases[REPLICA]
+            replica = sqlite3.connect(path)
+            try:
+                names = replica.execute(
+                    'SELECT name FROM calories_product').fetchall()
+            finally:
+                replica.close()
+        self.assertEqual(names, [('product',)])
+        self.assertGreaterEqual(replicas_refreshed_at(), started)
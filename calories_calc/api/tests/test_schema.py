@@ -0,0 +1,73 @@
+import json
+import subprocess
+import sys
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from calories_calc import schema
+
+
+class TestSchema(SimpleTestCase):
+    SCHEMA_PATH = '/swagger.json'
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for cached in (schema.get_schema_document, schema.get_ui_schema):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+    def test_schema_is_generated_once_and_served_with_etag(self):
+        with override_settings(SCHEMA_DIR=Path(self.directory.name)), \
+                mock.patch.object(schema, 'generate_schema',
+                                  wraps=schema.generate_schema) as generate:
+            response = self.client.get(self.SCHEMA_PATH)
+            etag = response['ETag']
+            self.assertIn('/products/', json.loads(response.content)[
+                'paths'])
+            spec = self.client.get('/swagger/', {'format': 'openapi'})
+            not_modified = self.client.get(self.SCHEMA_PATH,
+                                           HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(spec.content, response.content)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+    def test_ui_pages_do_not_generate_schema_per_request(self):
+        from drf_yasg.generators import OpenAPISchemaGenerator
+
+        with mock.patch.object(
+                OpenAPISchemaGenerator, 'get_schema', autospec=True,
+                side_effect=OpenAPISchemaGenerator.get_schema) as get_schema:
+            for path in ('/swagger/', '/redoc/') * 2:
+                with self.subTest(path=path):
+                    response = self.client.get(path)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertContains(response, 'Kcal API')
+        self.assertEqual(get_schema.call_count, 1)
+
+    def test_schema_is_served_from_generated_files(self):
+        call_command('generate_schema', output_dir=Path(self.directory.name),
+                     stdout=StringIO())
+        path = Path(self.directory.name) / 'schema.yaml'
+        path.write_bytes(path.read_bytes() + b'# generated\n')
+        with override_settings(SCHEMA_DIR=Path(self.directory.name)), \
+                mock.patch.object(schema, 'generate_schema') as generate:
+            response = self.client.get('/swagger.yaml')
+        generate.assert_not_called()
+        self.assertEqual(response.content, path.read_bytes())
+
+    def test_urls_do_not_import_schema_generator(self):
+        code = ('import sys, django; django.setup(); '
+                'import calories_calc.urls; '
+                'print("drf_yasg.generators" in sys.modules)')
+        result = subprocess.run(
+            (sys.executable, '-c', code), capture_output=True, text=True,
+            env={'DJANGO_SETTINGS_MODULE': 'calories_calc.settings'},
+            cwd=Path(__file__).resolve().parents[2], check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
@@ -0,0 +1,245 @@
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIClient, APITestCase
+
+from api.authentication import ClaimsRefreshToken
+from calories.management.commands.rebalance_diary_shards import Command
+from calories.models import Category, DailyKcalTotal, EatenProduct, Product
+from calories.registry import category_registry
+from calories.routers import diary_shards, shard_for_user
+
+
+User = get_user_model()
+
+SHARDS = ('diary_0', 'diary_1')
+
+
+@override_settings(DIARY_SHARDS=len(SHARDS))
+class TestDiaryShards(APITestCase):
+
+    # Шарды в памяти создаются заново для каждого теста: тестовый
+    # раннер готовит только базы из settings.DATABASES.
+    def setUp(self):
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+            connections.ensure_defaults(alias)
+            connections.prepare_test_settings(alias)
+            self.addCleanup(self.remove_shard, alias)
+            call_command('migrate', database=alias, verbosity=0)
+        category_registry.refresh()
+
+    def remove_shard(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'user{number}')
+                     for number in range(4)]
+        cls.category = Category.objects.create(name='category', slug='slug')
+        cls.product = Product.objects.create(
+            name='product', weight=100, unit_of_measurement='гр',
+            kcal=200, category=cls.category)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=(
+            f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'))
+        return client
+
+    def test_users_are_spread_over_shards(self):
+        self.assertEqual(diary_shards(), list(SHARDS))
+        self.assertEqual(
+            {shard_for_user(user.id) for user in self.users}, set(SHARDS))
+        self.assertEqual(shard_for_user(self.users[0].id),
+                         shard_for_user(self.users[0].id))
+
+    def test_diary_is_stored_in_user_shard(self):
+        user = self.users[0]
+        shard = shard_for_user(user.id)
+        client = self.client_for(user)
+        response = client.post('/api/my_products/',
+                               {'product': self.product.id, 'weight': 50},
+                               format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['product'], self.product.name)
+        self.assertEqual(response.data['kcal'], 100)
+        self.assertFalse(EatenProduct.objects.using('default').exists())
+        self.assertEqual(
+            EatenProduct.objects.using(shard).get().user_id, user.id)
+        self.assertEqual(
+            DailyKcalTotal.objects.using(shard).get().total_kcal, 100)
+        results = client.get('/api/my_products/').data['results']
+        self.assertEqual([row['product'] for row in results],
+                         [self.product.name])
+        self.assertEqual(len(client.get(
+            '/api/my_products/', {'search': 'product'}).data['results']), 1)
+        self.assertEqual(client.get('/api/total_kcal/').data['results'][0][
+            'total_kcal_for_day'], 100)
+        summary = client.get('/api/total_kcal/summary/').data
+        self.assertEqual(summary['buckets'][0]['categories'],
+                         [{'category': 'slug', 'total_kcal': 100}])
+        lines = b''.join(client.get(
+            '/api/my_products/export/', {'format': 'csv'}
+        ).streaming_content).decode().splitlines()
+        self.assertIn(',product,slug,', lines[1])
+        token = client.get('/api/my_products/changes/').data['token']
+        self.assertTrue(token.startswith(f'{shard}:'))
+        response = client.delete(f'/api/my_products/{results[0]["id"]}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(DailyKcalTotal.objects.using(shard).exists())
+        self.assertEqual(client.get('/api/my_products/changes/', {
+            'since': token}).data['deleted'], [results[0]['id']])
+
+    def test_product_delete_cascades_to_shards(self):
+        for user in self.users:
+            EatenProduct.objects.create(
+                product=self.product, weight=100, kcal=200,
+                category=self.category, user=user)
+        self.assertEqual(
+            sum(EatenProduct.objects.using(alias).count()
+                for alias in SHARDS), len(self.users))
+        self.product.delete()
+        for alias in SHARDS:
+            self.assertFalse(EatenProduct.objects.using(alias).exists())
+            self.assertFalse(DailyKcalTotal.objects.using(alias).exists())
+
+    def test_rebalance_moves_diaries_to_user_shards(self):
+        for user in self.users:
+            EatenProduct.objects.using('default').create(
+                product=self.product, weight=100, kcal=200,
+                category=self.category, user=user)
+            DailyKcalTotal.objects.using('default').create(
+                user=user, date=date.today(), total_kcal=200, entries=1)
+        ids = set(EatenProduct.objects.using('default').values_list(
+            'id', flat=True))
+        call_command('rebalance_diary_shards', stdout=StringIO())
+        self.assertFalse(EatenProduct.objects.using('default').exists())
+        self.assertFalse(DailyKcalTotal.objects.using('default').exists())
+        for user in self.users:
+            self.assertEqual(
+                EatenProduct.objects.for_user(user.id).count(), 1)
+            self.assertEqual(
+                DailyKcalTotal.objects.for_user(user.id).get().total_kcal,
+                200)
+        self.assertEqual(
+            {eaten_product.id for alias in SHARDS
+             for eaten_product in EatenProduct.objects.using(alias)}, ids)
+        out = StringIO()
+        call_command('rebalance_diary_shards', stdout=out)
+        self.assertIn('Перенесено пользователей: 0', out.getvalue())
+        call_command('rebuild_daily_totals', '--verify', stdout=StringIO())
+
+    def test_rebalance_keeps_entries_written_during_copy(self):
+        user = self.users[0]
+        EatenProduct.objects.using('default').create(
+            product=self.product, weight=100, kcal=200,
+            category=self.category, user=user)
+        copy_entries = Command.copy_entries
+        late_entries = []
+
+        def copy_with_concurrent_write(command, *args):
+            result = copy_entries(command, *args)
+            if not late_entries:
+                late_entries.append(EatenProduct.objects.using(
+                    'default').create(
+                        product=self.product, weight=50, kcal=100,
+                        category=self.category, user=user))
+            return result
+
+        with mock.patch.object(Command, 'copy_entries',
+                               copy_with_concurrent_write):
+            call_command('rebalance_diary_shards', stdout=StringIO())
+        self.assertFalse(EatenProduct.objects.using('default').exists())
+        self.assertFalse(DailyKcalTotal.objects.using('default').exists())
+        self.assertEqual(
+            sorted(EatenProduct.objects.for_user(user.id).values_list(
+                'kcal', flat=True)), [100, 200])
+        self.assertEqual(
+            DailyKcalTotal.objects.for_user(user.id).get().total_kcal, 300)
+
+    def test_rebalance_keeps_publication_dates(self):
+        user = self.users[0]
+        days = (date(2020, 1, 1), date(2020, 1, 1), date(2020, 1, 2))
+        for day in days:
+            eaten_product = EatenProduct.objects.using('default').create(
+                product=self.product, weight=100, kcal=100,
+                category=self.category, user=user)
+            EatenProduct.objects.using('default').filter(
+                id=eaten_product.id).update(publication_date=day)
+        call_command('rebalance_diary_shards', stdout=StringIO())
+        self.assertEqual(
+            sorted(EatenProduct.objects.for_user(user.id).values_list(
+                'publication_date', flat=True)), list(days))
+        self.assertEqual(
+            list(DailyKcalTotal.objects.for_user(user.id).order_by(
+                'date').values_list('date', 'total_kcal', 'entries')),
+            [(date(2020, 1, 1), 200, 2), (date(2020, 1, 2), 100, 1)])
+        self.assertTrue(EatenProduct._meta.get_field(
+            'publication_date').auto_now_add)
+
+    def foreign_keys(self, alias, table):
+        with connections[alias].cursor() as cursor:
+            constraints = connections[alias].introspection.get_constraints(
+                cursor, table)
+        return {column for constraint in constraints.values()
+                if constraint['foreign_key']
+                for column in constraint['columns']}
+
+    def test_foreign_keys_are_dropped_only_in_shards(self):
+        self.assertEqual(
+            self.foreign_keys('default', 'calories_eatenproduct'),
+            {'product_id', 'category_id', 'user_id'})
+        self.assertEqual(
+            self.foreign_keys('default', 'calories_dailykcaltotal'),
+            {'user_id'})
+        for alias in SHARDS:
+            for table in ('calories_eatenproduct', 'calories_dailykcaltotal',
+                          'calories_eatenproductchange'):
+                self.assertEqual(self.foreign_keys(alias, table), set())
+
+    def check_integrity(self, *args):
+        stderr = StringIO()
+        call_command('check_diary_integrity', *args,
+                     stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_dangling_references_are_reported_and_fixed(self):
+        author, reader = self.users[:2]
+        diary_category = Category.objects.create(name='old', slug='old')
+        other_product = Product.objects.create(
+            name='other', weight=100, unit_of_measurement='гр', kcal=100)
+        for user in (author, reader):
+            for product in (self.product, other_product):
+                EatenProduct.objects.create(
+                    product=product, weight=100, kcal=100,
+                    category=diary_category, user=user)
+        self.assertEqual(self.check_integrity(), '')
+        # Удаление в обход Django не каскадируется на шарды.
+        for queryset in (Product.objects.filter(id=other_product.id),
+                         Category.objects.filter(id=diary_category.id),
+                         User.objects.filter(id=reader.id)):
+            queryset._raw_delete(queryset.db)
+        with self.assertRaisesMessage(CommandError, 'Битых ссылок'):
+            self.check_integrity()
+        errors = self.check_integrity('--fix')
+        self.assertIn('calories_eatenproduct.product_id', errors)
+        self.assertIn('calories_eatenproduct.category_id', errors)
+        self.assertIn('calories_eatenproductchange.user_id', errors)
+        self.assertEqual(
+            list(EatenProduct.objects.for_user(author.id).values_list(
+                'product_id', 'category_id')), [(self.product.id, None)])
+        self.assertFalse(EatenProduct.objects.for_user(reader.id).exists())
+        self.assertFalse(DailyKcalTotal.objects.for_user(reader.id).exists())
+        self.assertEqual(self.check_integrity(), '')
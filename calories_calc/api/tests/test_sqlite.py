@@ -0,0 +1,89 @@
+import sqlite3
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+THREADS = 8
+TRANSACTIONS_PER_THREAD = 50
+
+
+class TestProductionSQLite(SimpleTestCase):
+    alias = 'concurrency'
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/db.sqlite3'
+        patcher = mock.patch.dict(connections.databases, {self.alias: {
+            **settings.SQLITE_PRODUCTION_SETTINGS,
+            'NAME': self.path,
+        }})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.close_connection)
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE diary (id INTEGER PRIMARY KEY, '
+                           'user_id INTEGER, kcal INTEGER)')
+
+    def close_connection(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+
+    def write(self, user_id, errors):
+        try:
+            for _ in range(TRANSACTIONS_PER_THREAD):
+                with transaction.atomic(using=self.alias):
+                    with connections[self.alias].cursor() as cursor:
+                        cursor.execute(
+                            'SELECT COALESCE(SUM(kcal), 0) FROM diary '
+                            'WHERE user_id = %s', (user_id,))
+                        cursor.execute(
+                            'INSERT INTO diary (user_id, kcal) '
+                            'VALUES (%s, %s)', (user_id, 100))
+        except OperationalError as error:
+            errors.append(error)
+        finally:
+            connections[self.alias].close()
+
+    def test_pragmas_are_applied(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_atomic_takes_write_lock_on_begin(self):
+        other = sqlite3.connect(self.path, timeout=0,
+                                isolation_level=None)
+        self.addCleanup(other.close)
+        with CaptureQueriesContext(connections[self.alias]) as context:
+            with transaction.atomic(using=self.alias):
+                # Блокировка на запись взята до первого запроса.
+                with self.assertRaisesMessage(sqlite3.OperationalError,
+                                              'database is locked'):
+                    other.execute('BEGIN IMMEDIATE')
+        self.assertEqual(context.captured_queries[0]['sql'],
+                         'BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+    def test_concurrent_writers_do_not_get_locked(self):
+        errors = []
+        threads = [
+            Thread(target=self.write, args=(user_id, errors))
+            for user_id in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM diary')
+            writes = cursor.fetchone()[0]
+        self.assertEqual(writes, THREADS * TRANSACTIONS_PER_THREAD)
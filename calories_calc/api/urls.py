@@ -1,6 +1,9 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
+from .authentication import ClaimsTokenObtainPairView
+from .batch import BatchView
 from .views import (CategoryViewSet, EatenProductViewSet,
                     ProductViewSet, TotalKcalViewSet)
 
@@ -14,10 +17,30 @@ urlpatterns = [
     path(
         'auth/', include(
             [
+                re_path(r'^jwt/create/?$',
+                        ClaimsTokenObtainPairView.as_view(),
+                        name='jwt-create'),
                 path('', include('djoser.urls')),
                 path('', include('djoser.urls.jwt'))
             ]
         )
     ),
+    path(
+        'async/', include(
+            [
+                path('products/', async_views.product_list,
+                     name='async-products-list'),
+                path('products/<int:pk>/', async_views.product_detail,
+                     name='async-products-detail'),
+                path('my_products/', async_views.eaten_product_list,
+                     name='async-my_products-list'),
+                path('total_kcal/', async_views.total_kcal_list,
+                     name='async-total_kcal-list'),
+            ]
+        )
+    ),
+    path('batch/', BatchView.as_view(
+        viewsets=tuple(viewset for _, viewset, _ in router.registry)),
+        name='batch'),
     path('', include(router.urls))
 ]
@@ -1,65 +1,261 @@
-from django.db.models import Sum
+from datetime import date, datetime, time
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import get_object_or_404
-from rest_framework import filters, permissions, viewsets
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
-from calories.models import Category, EatenProduct, Product
-from .filters import CategoryFilter
+from calories import search
+from calories.constants import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                                BULK_MAX_ITEMS, CATALOG_VERSION,
+                                DIARY_VERSION)
+from calories.export import EXPORTERS
+from calories.models import (Category, DailyKcalTotal, EatenProduct,
+                             Product)
+from calories.registry import category_registry
+from calories.routers import is_sharded, shard_for_user
+from calories.summary import build_summary
+from calories.sync import diary_changes
+from calories.versions import user_diary_version
+from .authentication import ClaimsJWTAuthentication
+from .filters import CategoryFilter, ProductNameSearchFilter
+from .mixins import (ConditionalGetMixin, PageNumberOptInMixin,
+                     ReplicaReadMixin, SerializerMetricsMixin,
+                     ValuesListMixin, VersionedCacheMixin)
+from .pagination import KeysetPagination, TotalKcalKeysetPagination
 from .permissions import AccessForUser, AdminOrReadOnly
-from .serializers import (CategorySerializer, EatenProductSerializer,
-                          ProductSerializer, TotalKcalSerializer)
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (CategorySerializer, EatenProductBulkSerializer,
+                          EatenProductSerializer, ProductSerializer,
+                          TotalKcalSerializer,
+                          TotalKcalSummaryQuerySerializer)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SerializerMetricsMixin, ConditionalGetMixin,
+                      viewsets.ModelViewSet):
+    authentication_classes = (ClaimsJWTAuthentication,)
+    conditional_version_names = (CATALOG_VERSION,)
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAdminUser,)
     lookup_field = 'slug'
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.select_related('category').all()
+class ProductViewSet(ReplicaReadMixin, SerializerMetricsMixin,
+                     ConditionalGetMixin, VersionedCacheMixin,
+                     ValuesListMixin, viewsets.ModelViewSet):
+    authentication_classes = (ClaimsJWTAuthentication,)
+    cache_version_name = CATALOG_VERSION
+    conditional_version_names = (CATALOG_VERSION,)
+    queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    values_list_fields = (
+        ('id', 'id'),
+        ('category', 'category_id'),
+        ('name', 'name'),
+        ('weight', 'weight'),
+        ('unit_of_measurement', 'unit_of_measurement'),
+        ('kcal', 'kcal'),
+    )
     permission_classes = (AdminOrReadOnly,)
-    filter_backends = (CategoryFilter, filters.SearchFilter)
+    filter_backends = (CategoryFilter, ProductNameSearchFilter)
     search_fields = ('name',)
+    search_product_lookup = 'id'
+
+    def get_values_list_converters(self, rows):
+        return {'category': category_registry.slugs().get}
+
+    @action(detail=False)
+    def autocomplete(self, request):
+        try:
+            limit = min(max(int(request.query_params.get(
+                'limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        query = request.query_params.get('q', '')
+        if search.is_available():
+            return Response(search.autocomplete(query, limit))
+        products = self.get_queryset().filter(
+            name__istartswith=query).values('id', 'name')[:limit]
+        return Response(list(products))
 
 
-class EatenProductViewSet(viewsets.ModelViewSet):
+class EatenProductViewSet(ReplicaReadMixin, SerializerMetricsMixin,
+                          PageNumberOptInMixin, ValuesListMixin,
+                          viewsets.ModelViewSet):
+    authentication_classes = (ClaimsJWTAuthentication,)
     serializer_class = EatenProductSerializer
+    values_list_fields = (
+        ('id', 'id'),
+        ('product', 'product__name'),
+        ('category', 'category_id'),
+        ('weight', 'weight'),
+        ('unit_of_measurement', 'unit_of_measurement'),
+        ('kcal', 'kcal'),
+        ('publication_date', 'publication_date'),
+    )
+    pagination_class = KeysetPagination
     permission_classes = (permissions.IsAuthenticated, AccessForUser)
     filter_backends = (CategoryFilter, DjangoFilterBackend,
-                       filters.SearchFilter)
+                       ProductNameSearchFilter)
     filterset_fields = ('publication_date',)
     search_fields = ('product__name',)
+    search_product_lookup = 'product_id'
+
+    def get_values_list_fields(self):
+        if not is_sharded():
+            return self.values_list_fields
+        # Каталог в default, поэтому названия продуктов подставляются
+        # отдельным запросом вместо JOIN.
+        return tuple(
+            (name, 'product_id' if name == 'product' else lookup)
+            for name, lookup in self.values_list_fields)
+
+    def get_values_list_converters(self, rows):
+        converters = {'category': category_registry.slugs().get,
+                      'publication_date': date.isoformat}
+        if is_sharded():
+            converters['product'] = dict(Product.objects.filter(
+                id__in={row['product_id'] for row in rows}
+            ).values_list('id', 'name')).get
+        return converters
+
+    def get_replica_version_names(self):
+        # Дневник меняется и каскадом при удалении продуктов, а в списке
+        # есть названия продуктов.
+        return (user_diary_version(self.request.user.id), CATALOG_VERSION)
+
+    @property
+    def diary_db(self):
+        return shard_for_user(self.request.user.id)
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return EatenProduct.objects.none()
-        return self.request.user.eaten_products.all()
+        queryset = EatenProduct.objects.for_user(self.request.user.id)
+        if is_sharded():
+            # JOIN между шардом и default невозможен.
+            return queryset.prefetch_related('product')
+        return queryset.select_related('product')
 
     def perform_create(self, serializer):
-        product_instance = get_object_or_404(
-            Product, id=serializer.initial_data['product'])
-        product_weight = product_instance.weight
-        product_kcal = product_instance.kcal
-        eaten_product_weight = serializer.initial_data['weight']
-        calculated_kcal = product_kcal / product_weight * int(
-            eaten_product_weight)
-        serializer.save(
-            user=self.request.user,
-            kcal=calculated_kcal,
-            unit_of_measurement=product_instance.unit_of_measurement,
-            category=product_instance.category)
-
-
-class TotalKcalViewSet(viewsets.ReadOnlyModelViewSet):
+        product = serializer.validated_data['product']
+        with transaction.atomic(using=self.diary_db):
+            serializer.save(
+                user_id=self.request.user.id,
+                kcal=product.kcal_for(serializer.validated_data['weight']),
+                unit_of_measurement=product.unit_of_measurement,
+                category_id=product.category_id)
+
+    @action(detail=False, methods=('post',))
+    def bulk(self, request):
+        serializer = EatenProductBulkSerializer(
+            data=request.data, many=True, max_length=BULK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(using=self.diary_db):
+            eaten_products = serializer.save(user_id=request.user.id)
+        return Response(
+            EatenProductSerializer(eaten_products, many=True).data,
+            status=status.HTTP_201_CREATED)
+
+    @action(detail=False)
+    def changes(self, request):
+        changes = diary_changes(request.user.id,
+                                request.query_params.get('since'),
+                                self.get_queryset())
+        changes['changed'] = self.get_serializer(
+            changes['changed'], many=True).data
+        return Response(changes)
+
+    @action(detail=False, renderer_classes=(CSVRenderer, NDJSONRenderer))
+    def export(self, request):
+        renderer = request.accepted_renderer
+        content = EXPORTERS[renderer.format](
+            self.filter_queryset(self.get_queryset()))
+        if isinstance(request._request, ASGIRequest):
+            # Django 3.2 перебирает потоковый ответ в цикле событий, где
+            # ORM недоступен, поэтому под ASGI пачки строк читаются здесь.
+            content = list(content)
+        response = StreamingHttpResponse(
+            content,
+            content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = (
+            f'attachment; filename="my_products.{renderer.format}"')
+        return response
+
+    def handle_exception(self, exc):
+        if self.action == 'export':
+            # Ошибка выгрузки отдается в JSON, а не в формате файла.
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+    def perform_update(self, serializer):
+        with transaction.atomic(using=self.diary_db):
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=self.diary_db):
+            super().perform_destroy(instance)
+
+
+class TotalKcalViewSet(ReplicaReadMixin, SerializerMetricsMixin,
+                       ConditionalGetMixin, PageNumberOptInMixin,
+                       ValuesListMixin, viewsets.ReadOnlyModelViewSet):
+    authentication_classes = (ClaimsJWTAuthentication,)
     serializer_class = TotalKcalSerializer
-    lookup_field = 'publication_date'
+    values_list_fields = (
+        ('date', 'date'),
+        ('total_kcal_for_day', 'total_kcal'),
+    )
+    pagination_class = TotalKcalKeysetPagination
+    lookup_field = 'date'
+    lookup_url_kwarg = 'publication_date'
+
+    def get_values_list_converters(self, rows):
+        return {'date': date.isoformat}
 
     def get_queryset(self):
-        return EatenProduct.objects.select_related(
-            'category', 'product', 'user').filter(
-                user=self.request.user).values('publication_date').annotate(
-                    total_kcal_for_day=Sum('kcal')).order_by(
-                        '-publication_date')
+        if getattr(self, "swagger_fake_view", False):
+            return DailyKcalTotal.objects.none()
+        return DailyKcalTotal.objects.for_user(self.request.user.id)
+
+    def get_conditional_version_names(self):
+        names = (DIARY_VERSION, user_diary_version(self.request.user.id))
+        if self.action == 'summary':
+            # В сводке есть слаги категорий.
+            names += (CATALOG_VERSION,)
+        return names
+
+    def get_conditional_key(self, request):
+        key = super().get_conditional_key(request)
+        if self.action != 'summary':
+            return key
+        # Период по умолчанию заканчивается сегодня и сдвигается в полночь.
+        return f'{key}:{self.summary_query["from"]}:{self.summary_query["to"]}'
+
+    def get_validators(self, request):
+        etag, last_modified = super().get_validators(request)
+        if self.action == 'summary' and 'to' not in request.query_params:
+            last_modified = max(last_modified, int(datetime.combine(
+                self.summary_query['to'], time.min).timestamp()))
+        return etag, last_modified
+
+    @action(detail=False)
+    def summary(self, request):
+        serializer = TotalKcalSummaryQuerySerializer(
+            data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        self.summary_query = serializer.validated_data
+        return self.conditional_response(self.build_summary, request)
+
+    def build_summary(self, request):
+        return Response(build_summary(
+            EatenProduct.objects.for_user(request.user.id),
+            self.summary_query['from'],
+            self.summary_query['to'],
+            self.summary_query['bucket']))
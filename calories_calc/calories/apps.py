@@ -5,3 +5,6 @@ class CaloriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calories'
     verbose_name = 'Калорийности'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -8,3 +8,22 @@ UNIT_OF_MEASUREMENT = [
     ('чл', 'чайная ложка'),
     ('сл', 'столовая ложка')
 ]
+STATE_CACHE_ALIAS = 'state'
+VERSION_CACHE_PREFIX = 'version'
+CATALOG_VERSION = 'catalog'
+CATEGORY_VERSION = 'category'
+DIARY_VERSION = 'diary'
+TOKEN_VERSION_CACHE_PREFIX = 'token_version'
+PRODUCT_SEARCH_TABLE = 'calories_product_search'
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+SUMMARY_DEFAULT_DAYS = 365
+EXPORT_CHUNK_SIZE = 2000
+DIARY_SHARD_PREFIX = 'diary_'
+PRIMARY_READS_CACHE_PREFIX = 'primary_reads'
+REPLICAS_REFRESHED_CACHE_KEY = 'replicas_refreshed'
+DIARY_CHANGES_LIMIT = 1000
+BATCH_MAX_REQUESTS = 20
+BULK_MAX_ITEMS = 100
+BATCH_MAX_WORKERS = 4
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
@@ -0,0 +1,56 @@
+import csv
+import json
+from itertools import islice
+
+from .constants import EXPORT_CHUNK_SIZE
+from .models import Product
+from .registry import category_registry
+
+EXPORT_FIELDS = ('id', 'publication_date', 'product_id', 'category_id',
+                 'weight', 'unit_of_measurement', 'kcal')
+EXPORT_COLUMNS = ('id', 'publication_date', 'product', 'category',
+                  'weight', 'unit_of_measurement', 'kcal')
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+# Дневник может лежать в шарде, поэтому названия продуктов и слаги
+# категорий подставляются без JOIN, по одному запросу на пачку строк.
+def export_chunks(eaten_products):
+    rows = eaten_products.order_by('-publication_date', '-id').values_list(
+        *EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        product_names = dict(Product.objects.filter(
+            id__in={row[2] for row in chunk}).values_list('id', 'name'))
+        category_slugs = category_registry.slugs()
+        yield [(id, day, product_names.get(product_id),
+                category_slugs.get(category_id), *rest)
+               for id, day, product_id, category_id, *rest in chunk]
+
+
+def iter_csv(eaten_products):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for chunk in export_chunks(eaten_products):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def iter_ndjson(eaten_products):
+    for chunk in export_chunks(eaten_products):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)),
+                       ensure_ascii=False, default=str) + '\n'
+            for row in chunk)
+
+
+EXPORTERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from calories.constants import DIARY_VERSION
+from calories.models import (Category, DailyKcalTotal, EatenProduct,
+                             EatenProductChange, Product, User)
+from calories.routers import diary_databases
+from calories.versions import bump_version_on_commit
+
+# В шардах внешние ключи дневников не проверяются базой, как и ключ журнала
+# изменений на пользователя (см. calories.models).
+# Порядок важен для --fix: удаление записей дневника обновляет итоги
+# и пишет журнал изменений, которые проверяются после.
+CHECKS = (
+    (EatenProduct, 'product_id', Product),
+    (EatenProduct, 'category_id', Category),
+    (EatenProduct, 'user_id', User),
+    (DailyKcalTotal, 'user_id', User),
+    (EatenProductChange, 'user_id', User),
+)
+
+
+class Command(BaseCommand):
+    help = ('Ищет в дневниках, итогах по дням и журнале изменений ссылки '
+            'на удаленные продукты, категории и пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Удалить записи без продукта или пользователя и '
+                 'очистить удаленные категории.')
+
+    def missing_ids(self, using, model, field, target):
+        ids = set(model.objects.using(using).order_by().exclude(**{
+            f'{field}__isnull': True}).values_list(field, flat=True)
+            .distinct().iterator())
+        return ids - set(target.objects.values_list(
+            'id', flat=True).iterator())
+
+    def fix(self, using, model, field, ids):
+        rows = model.objects.using(using).filter(**{f'{field}__in': ids})
+        if model is EatenProduct and field == 'category_id':
+            rows.update(category=None)
+        else:
+            rows.delete()
+
+    def handle(self, *args, **options):
+        problems = 0
+        for using in diary_databases():
+            for model, field, target in CHECKS:
+                ids = sorted(self.missing_ids(using, model, field, target))
+                if not ids:
+                    continue
+                problems += len(ids)
+                self.stderr.write(
+                    f'{using}: {model._meta.db_table}.{field} ссылается '
+                    f'на несуществующие {target._meta.db_table}: '
+                    f'{", ".join(map(str, ids))}')
+                if options['fix']:
+                    with transaction.atomic(using=using):
+                        self.fix(using, model, field, ids)
+        if problems and options['fix']:
+            bump_version_on_commit(DIARY_VERSION)
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено ссылок: {problems}'))
+        elif problems:
+            raise CommandError(f'Битых ссылок: {problems}')
+        else:
+            self.stdout.write(self.style.SUCCESS('Ссылки дневников целы'))
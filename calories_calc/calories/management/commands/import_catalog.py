@@ -0,0 +1,125 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from calories.constants import (CATALOG_VERSION, NAME_MAX_LENGTH,
+                                UNIT_OF_MEASUREMENT)
+from calories.models import Category, Product
+from calories.versions import bump_version_on_commit
+
+FORMATS = ('csv', 'jsonl')
+UPDATE_FIELDS = ('weight', 'unit_of_measurement', 'kcal', 'category')
+UNITS = {unit for unit, _ in UNIT_OF_MEASUREMENT}
+SMALL_INTEGER_MAX = 32767
+INTEGER_MAX = 2147483647
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает продукты из CSV или JSONL файла, '
+            'обновляя существующие по названию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def read_rows(self, file, file_format):
+        if file_format == 'csv':
+            yield from enumerate(csv.DictReader(file), start=2)
+            return
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield line_number, error
+
+    def parse_integer(self, row, field, maximum=SMALL_INTEGER_MAX):
+        try:
+            value = int(row[field])
+        except (KeyError, TypeError, ValueError):
+            raise RowError(f'{field}: ожидается целое число')
+        if not 0 <= value <= maximum:
+            raise RowError(f'{field}: значение вне диапазона')
+        return value
+
+    def build_product(self, row, categories):
+        if not isinstance(row, dict):
+            raise RowError(f'некорректная строка: {row}')
+        name = (row.get('name') or '').strip()
+        if not name or len(name) > NAME_MAX_LENGTH:
+            raise RowError('name: пустое или слишком длинное название')
+        unit = row.get('unit_of_measurement')
+        if unit not in UNITS:
+            raise RowError(f'unit_of_measurement: неизвестная единица {unit}')
+        category_slug = row.get('category') or None
+        if category_slug is not None and category_slug not in categories:
+            raise RowError(f'category: неизвестная категория {category_slug}')
+        return Product(
+            name=name,
+            weight=self.parse_integer(row, 'weight'),
+            unit_of_measurement=unit,
+            kcal=self.parse_integer(row, 'kcal', INTEGER_MAX),
+            category_id=categories.get(category_slug),
+        )
+
+    @transaction.atomic
+    def save_batch(self, products):
+        existing = Product.objects.in_bulk(products, field_name='name')
+        to_update = []
+        for name, product in products.items():
+            if name in existing:
+                product.id = existing[name].id
+                to_update.append(product)
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS)
+        Product.objects.bulk_create(
+            product for product in products.values() if product.id is None)
+        return len(products) - len(to_update), len(to_update)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        categories = dict(Category.objects.values_list('slug', 'id'))
+        created = updated = rejected = 0
+        started = time.monotonic()
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = self.read_rows(file, file_format)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                products = {}
+                for line_number, row in batch:
+                    try:
+                        if isinstance(row, Exception):
+                            raise RowError(str(row))
+                        product = self.build_product(row, categories)
+                    except RowError as error:
+                        rejected += 1
+                        self.stderr.write(f'Строка {line_number}: {error}')
+                        continue
+                    products[product.name] = product
+                batch_created, batch_updated = self.save_batch(products)
+                created += batch_created
+                updated += batch_updated
+        bump_version_on_commit(CATALOG_VERSION)
+        elapsed = time.monotonic() - started
+        imported = created + updated
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {created}, обновлено: {updated}, '
+            f'отклонено: {rejected}. '
+            f'{imported / elapsed if elapsed else imported:.0f} строк/с '
+            f'за {elapsed:.1f} с'))
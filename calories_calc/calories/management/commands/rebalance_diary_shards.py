@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from calories.models import (DailyKcalTotal, EatenProduct, EatenProductChange,
+                             explicit_publication_date)
+from calories.routers import diary_shards, shard_for_user
+from calories.versions import bump_version_on_commit, user_diary_version
+
+
+class Command(BaseCommand):
+    help = ('Переносит дневники и итоги по дням из default и шардов '
+            'в шард пользователя после изменения DIARY_SHARDS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько записей будет перенесено.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def misplaced_users(self, source):
+        user_ids = set(EatenProduct.objects.using(source).order_by(
+        ).values_list('user_id', flat=True).distinct())
+        user_ids.update(DailyKcalTotal.objects.using(source).order_by(
+        ).values_list('user_id', flat=True).distinct())
+        return sorted(user_id for user_id in user_ids
+                      if shard_for_user(user_id) != source)
+
+    def copy_entries(self, user_id, source, target, batch_size):
+        eaten_products = list(
+            EatenProduct.objects.using(source).filter(user_id=user_id))
+        copied_ids = [eaten_product.id for eaten_product in eaten_products]
+        owners = dict(EatenProduct.objects.using(target).filter(
+            id__in=copied_ids).values_list('id', 'user_id'))
+        moved = []
+        for eaten_product in eaten_products:
+            owner = owners.get(eaten_product.id)
+            if owner == user_id:
+                # Запись уже перенесена прерванным запуском.
+                continue
+            if owner is not None:
+                eaten_product.id = None
+            moved.append(eaten_product)
+        with transaction.atomic(using=target), explicit_publication_date():
+            EatenProduct.objects.using(target).bulk_create(
+                moved, batch_size=batch_size)
+            DailyKcalTotal.objects.rebuild(target, [user_id])
+        return copied_ids, len(moved)
+
+    def move_user(self, user_id, source, target, batch_size):
+        moved = 0
+        while True:
+            # При BEGIN IMMEDIATE транзакция источника не дает писать
+            # в него до удаления. Без нее удаляются только скопированные
+            # id, а записи, добавленные во время копирования, переносятся
+            # следующим проходом.
+            with transaction.atomic(using=source):
+                copied_ids, count = self.copy_entries(
+                    user_id, source, target, batch_size)
+                for start in range(0, len(copied_ids), batch_size):
+                    # Без сигналов: они вычли бы записи из итогов
+                    # в новом шарде.
+                    EatenProduct.objects.using(source).filter(
+                        id__in=copied_ids[start:start + batch_size]
+                    )._raw_delete(source)
+            if not copied_ids:
+                break
+            moved += count
+        with transaction.atomic(using=source):
+            # Итоги по записям, появившимся после последнего прохода.
+            DailyKcalTotal.objects.rebuild(source, [user_id])
+            # Токены синхронизации содержат базу, клиенты перейдут
+            # на полную синхронизацию и журнал источника не нужен.
+            EatenProductChange.objects.using(source).filter(
+                user_id=user_id).delete()
+        bump_version_on_commit(user_diary_version(user_id))
+        return moved
+
+    def handle(self, *args, **options):
+        moved_users = moved_entries = 0
+        for source in dict.fromkeys((DEFAULT_DB_ALIAS, *diary_shards())):
+            for user_id in self.misplaced_users(source):
+                target = shard_for_user(user_id)
+                if options['dry_run']:
+                    entries = EatenProduct.objects.using(source).filter(
+                        user_id=user_id).count()
+                else:
+                    entries = self.move_user(user_id, source, target,
+                                             options['batch_size'])
+                self.stdout.write(
+                    f'user={user_id}: {source} -> {target}, '
+                    f'записей: {entries}')
+                moved_users += 1
+                moved_entries += entries
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено пользователей: {moved_users}, '
+            f'записей: {moved_entries}'))
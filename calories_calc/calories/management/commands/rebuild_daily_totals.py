@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from calories.constants import DIARY_VERSION
+from calories.models import DailyKcalTotal
+from calories.routers import diary_databases
+from calories.versions import bump_version_on_commit
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает таблицу калорийности по дням '
+            'из съеденных продуктов или проверяет ее.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить таблицу с исходными данными.')
+
+    def stored_totals(self, using):
+        days = DailyKcalTotal.objects.using(using).order_by().values_list(
+            'user_id', 'date', 'total_kcal', 'entries')
+        return {
+            (user_id, date): (total_kcal, entries)
+            for user_id, date, total_kcal, entries in days.iterator()
+        }
+
+    def verify(self, using):
+        calculated = DailyKcalTotal.objects.calculate(using)
+        stored = self.stored_totals(using)
+        mismatches = [
+            key for key in calculated.keys() | stored.keys()
+            if calculated.get(key) != stored.get(key)
+        ]
+        for user_id, date in sorted(mismatches, key=str):
+            self.stderr.write(
+                f'{using}: user={user_id} date={date}: '
+                f'ожидалось {calculated.get((user_id, date))}, '
+                f'в таблице {stored.get((user_id, date))}')
+        return len(mismatches), len(stored)
+
+    def handle(self, *args, **options):
+        databases = diary_databases()
+        if options['verify']:
+            results = [self.verify(using) for using in databases]
+            mismatches = sum(count for count, _ in results)
+            if mismatches:
+                raise CommandError(
+                    f'Расхождений: {mismatches}')
+            self.stdout.write(self.style.SUCCESS(
+                'Таблица согласована, дней: '
+                f'{sum(days for _, days in results)}'))
+            return
+        for using in databases:
+            with transaction.atomic(using=using):
+                DailyKcalTotal.objects.rebuild(using)
+        bump_version_on_commit(DIARY_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            'Таблица калорийности по дням пересчитана'))
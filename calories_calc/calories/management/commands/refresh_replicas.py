@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from calories.routers import mark_replicas_refreshed
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики из '
+            'DATABASE_REPLICAS через backup API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование каждые N секунд.')
+
+    def refresh(self):
+        # Реплики содержат все, что записано до начала копирования.
+        # Время сохраняется в общем кеше, по нему процессы сервера решают,
+        # какие данные можно читать с реплик.
+        refreshed = time.time()
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            started = time.monotonic()
+            target = sqlite3.connect(
+                connections[alias].settings_dict['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(
+                f'{alias}: обновлена за {time.monotonic() - started:.2f} с')
+        mark_replicas_refreshed(refreshed)
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте DB_REPLICAS.')
+        while True:
+            self.refresh()
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
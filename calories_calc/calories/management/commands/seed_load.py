@@ -0,0 +1,112 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from calories.constants import CATALOG_VERSION, UNIT_OF_MEASUREMENT
+from calories.models import (Category, EatenProduct, Product, eaten_kcal,
+                             explicit_publication_date)
+from calories.versions import bump_version_on_commit
+
+User = get_user_model()
+
+LOAD_PREFIX = 'load'
+ADMIN_USERNAME = f'{LOAD_PREFIX}_admin'
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими категориями, продуктами, '
+            'пользователями и дневниками для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--entries', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def log(self, message, started):
+        self.stdout.write(f'{message} за {time.monotonic() - started:.1f} с')
+
+    def create_catalog(self, rng, options):
+        started = time.monotonic()
+        Category.objects.bulk_create(
+            Category(name=f'Категория {number}',
+                     slug=f'{LOAD_PREFIX}-{number}')
+            for number in range(options['categories']))
+        category_ids = list(Category.objects.filter(
+            slug__startswith=f'{LOAD_PREFIX}-').values_list('id', flat=True))
+        units = [unit for unit, _ in UNIT_OF_MEASUREMENT]
+        Product.objects.bulk_create(
+            (Product(name=f'Продукт {number}',
+                     weight=rng.choice((1, 10, 100)),
+                     unit_of_measurement=rng.choice(units),
+                     kcal=rng.randint(0, 900),
+                     category_id=rng.choice(category_ids))
+             for number in range(options['products'])),
+            batch_size=options['batch_size'])
+        bump_version_on_commit(CATALOG_VERSION)
+        self.log(f'Каталог: {options["categories"]} категорий, '
+                 f'{options["products"]} продуктов', started)
+
+    def create_users(self, options):
+        started = time.monotonic()
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=ADMIN_USERNAME, password=password,
+                  is_staff=True)] +
+            [User(username=f'{LOAD_PREFIX}_user_{number}', password=password)
+             for number in range(options['users'])],
+            batch_size=options['batch_size'])
+        self.log(f'Пользователи: {options["users"]}', started)
+
+    def create_entries(self, rng, options):
+        started = time.monotonic()
+        products = list(Product.objects.filter(
+            name__startswith='Продукт ').values_list(
+                'id', 'weight', 'kcal', 'unit_of_measurement', 'category_id'))
+        user_ids = list(User.objects.filter(
+            username__startswith=f'{LOAD_PREFIX}_user_').values_list(
+                'id', flat=True))
+        first_day = date.today() - timedelta(days=options['days'] - 1)
+        remaining = options['entries']
+        with explicit_publication_date():
+            while remaining > 0:
+                batch_size = min(remaining, options['batch_size'])
+                batch = []
+                for _ in range(batch_size):
+                    product_id, weight, kcal, unit, category_id = rng.choice(
+                        products)
+                    eaten_weight = weight * rng.randint(1, 4)
+                    batch.append(EatenProduct(
+                        product_id=product_id,
+                        weight=eaten_weight,
+                        kcal=eaten_kcal(kcal, weight, eaten_weight),
+                        unit_of_measurement=unit,
+                        category_id=category_id,
+                        user_id=rng.choice(user_ids),
+                        publication_date=first_day + timedelta(
+                            days=rng.randrange(options['days']))))
+                with transaction.atomic():
+                    EatenProduct.objects.bulk_create(batch)
+                remaining -= batch_size
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Дневники: {options["entries"]} записей за {elapsed:.1f} с '
+            f'({options["entries"] / elapsed if elapsed else 0:.0f} строк/с)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.create_catalog(rng, options)
+        self.create_users(options)
+        self.create_entries(rng, options)
+        started = time.monotonic()
+        call_command('rebuild_daily_totals', stdout=self.stdout)
+        self.log('Итоги по дням пересчитаны', started)
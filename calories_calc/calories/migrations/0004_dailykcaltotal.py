@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_daily_kcal_totals(apps, schema_editor):
+    EatenProduct = apps.get_model('calories', 'EatenProduct')
+    DailyKcalTotal = apps.get_model('calories', 'DailyKcalTotal')
+    days = EatenProduct.objects.order_by().values(
+        'user_id', 'publication_date').annotate(
+            total_kcal=models.Sum('kcal'), entries=models.Count('id'))
+    DailyKcalTotal.objects.bulk_create(
+        DailyKcalTotal(user_id=day['user_id'],
+                       date=day['publication_date'],
+                       total_kcal=day['total_kcal'],
+                       entries=day['entries'])
+        for day in days.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('calories', '0003_auto_20240221_2149'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyKcalTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('total_kcal', models.PositiveIntegerField(default=0, verbose_name='Ккал за день')),
+                ('entries', models.PositiveIntegerField(default=0, verbose_name='Количество продуктов')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_kcal_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'калорийность за день',
+                'verbose_name_plural': 'калорийность по дням',
+                'ordering': ('-date',),
+                'default_related_name': 'daily_kcal_totals',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailykcaltotal',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_user_date'),
+        ),
+        migrations.RunPython(fill_daily_kcal_totals,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('calories', '0004_dailykcaltotal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eatenproduct',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='eaten_products', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='eatenproduct',
+            index=models.Index(fields=['user', 'publication_date'], name='eaten_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eatenproduct',
+            index=models.Index(fields=['user', 'category', 'publication_date'], name='eaten_user_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name'], name='product_category_name_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'calories_product_search'
+NORMALIZED_NAME = "replace(replace({}.name, 'ё', 'е'), 'Ё', 'Е')"
+
+CREATE_SEARCH_INDEX = (
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    f"name, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    f"INSERT INTO {SEARCH_TABLE} (rowid, name) "
+    f"SELECT id, {NORMALIZED_NAME.format('calories_product')} "
+    f"FROM calories_product",
+    f"CREATE TRIGGER {SEARCH_TABLE}_insert "
+    f"AFTER INSERT ON calories_product BEGIN "
+    f"INSERT INTO {SEARCH_TABLE} (rowid, name) "
+    f"VALUES (new.id, {NORMALIZED_NAME.format('new')}); END",
+    f"CREATE TRIGGER {SEARCH_TABLE}_update "
+    f"AFTER UPDATE OF id, name ON calories_product BEGIN "
+    f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; "
+    f"INSERT INTO {SEARCH_TABLE} (rowid, name) "
+    f"VALUES (new.id, {NORMALIZED_NAME.format('new')}); END",
+    f"CREATE TRIGGER {SEARCH_TABLE}_delete "
+    f"AFTER DELETE ON calories_product BEGIN "
+    f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id; END",
+)
+
+DROP_SEARCH_INDEX = (
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+)
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calories', '0005_diary_and_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SEARCH_INDEX),
+                             run_on_sqlite(DROP_SEARCH_INDEX)),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:21
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+product_search = import_module('calories.migrations.0006_product_search')
+
+# Пересборка таблицы SQLite при AlterField удаляет триггеры поиска.
+rebuild_search_index = product_search.run_on_sqlite(
+    product_search.DROP_SEARCH_INDEX + product_search.CREATE_SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calories', '0006_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop,
+                             rebuild_search_index),
+        migrations.AlterField(
+            model_name='eatenproduct',
+            name='kcal',
+            field=models.PositiveIntegerField(verbose_name='Ккал'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='kcal',
+            field=models.PositiveIntegerField(verbose_name='Ккал'),
+        ),
+        migrations.RunPython(rebuild_search_index,
+                             migrations.RunPython.noop),
+    ]
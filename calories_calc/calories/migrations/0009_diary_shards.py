@@ -0,0 +1,98 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from calories.constants import DIARY_SHARD_PREFIX
+
+
+class AlterFieldsOnShards(migrations.operations.base.Operation):
+    """Меняет поля только в таблицах шардов дневника.
+
+    В шардах нет таблиц каталога и пользователей, поэтому там внешние
+    ключи создаются без ограничений, а состояние моделей и основная база
+    остаются с ограничениями. Миграции, пересобирающие эти таблицы SQLite,
+    должны повторить операцию.
+    """
+    reversible = True
+
+    def __init__(self, operations):
+        self.operations = operations
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.operations], {}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def shard_states(self, app_label, state):
+        # Изменения накапливаются: SQLite пересобирает таблицу целиком
+        # по состоянию модели.
+        states = [state]
+        for operation in self.operations:
+            state = state.clone()
+            operation.state_forwards(app_label, state)
+            states.append(state)
+        return states
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if not schema_editor.connection.alias.startswith(DIARY_SHARD_PREFIX):
+            return
+        states = self.shard_states(app_label, from_state)
+        for operation, before, after in zip(self.operations, states,
+                                            states[1:]):
+            operation.database_forwards(app_label, schema_editor, before,
+                                        after)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if not schema_editor.connection.alias.startswith(DIARY_SHARD_PREFIX):
+            return
+        states = self.shard_states(app_label, to_state)
+        for operation, before, after in reversed(list(zip(
+                self.operations, states, states[1:]))):
+            operation.database_forwards(app_label, schema_editor, after,
+                                        before)
+
+    def describe(self):
+        return 'Внешние ключи дневников без ограничений в шардах'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('calories', '0008_kcal_positive_integer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eatenproduct',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='eaten_products', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        AlterFieldsOnShards([
+            migrations.AlterField(
+                model_name='dailykcaltotal',
+                name='user',
+                field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_kcal_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+            ),
+            migrations.AlterField(
+                model_name='eatenproduct',
+                name='category',
+                field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eaten_products', to='calories.category', verbose_name='Категория'),
+            ),
+            migrations.AlterField(
+                model_name='eatenproduct',
+                name='product',
+                field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='eaten_products', to='calories.product', verbose_name='Продукт'),
+            ),
+            migrations.AlterField(
+                model_name='eatenproduct',
+                name='user',
+                field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='eaten_products', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+            ),
+        ]),
+    ]
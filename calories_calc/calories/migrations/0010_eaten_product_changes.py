@@ -0,0 +1,83 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:46
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import NotSupportedError, migrations, models
+import django.db.models.deletion
+
+run_on_sqlite = import_module(
+    'calories.migrations.0006_product_search').run_on_sqlite
+
+CHANGE_TABLE = 'calories_eatenproductchange'
+DIARY_TABLE = 'calories_eatenproduct'
+
+# Пересборка таблицы дневника при AlterField удаляет эти триггеры,
+# такие миграции должны создавать их заново.
+CREATE_CHANGE_TRIGGERS = (
+    f"CREATE TRIGGER {CHANGE_TABLE}_insert "
+    f"AFTER INSERT ON {DIARY_TABLE} BEGIN "
+    f"DELETE FROM {CHANGE_TABLE} WHERE eaten_product_id = new.id; "
+    f"INSERT INTO {CHANGE_TABLE} (user_id, eaten_product_id, deleted) "
+    f"VALUES (new.user_id, new.id, 0); END",
+    f"CREATE TRIGGER {CHANGE_TABLE}_update "
+    f"AFTER UPDATE ON {DIARY_TABLE} BEGIN "
+    f"DELETE FROM {CHANGE_TABLE} WHERE eaten_product_id = old.id; "
+    f"INSERT INTO {CHANGE_TABLE} (user_id, eaten_product_id, deleted) "
+    f"SELECT old.user_id, old.id, 1 WHERE old.user_id != new.user_id; "
+    f"INSERT INTO {CHANGE_TABLE} (user_id, eaten_product_id, deleted) "
+    f"VALUES (new.user_id, new.id, 0); END",
+    f"CREATE TRIGGER {CHANGE_TABLE}_delete "
+    f"AFTER DELETE ON {DIARY_TABLE} BEGIN "
+    f"DELETE FROM {CHANGE_TABLE} WHERE eaten_product_id = old.id; "
+    f"INSERT INTO {CHANGE_TABLE} (user_id, eaten_product_id, deleted) "
+    f"VALUES (old.user_id, old.id, 1); END",
+)
+
+DROP_CHANGE_TRIGGERS = (
+    f'DROP TRIGGER IF EXISTS {CHANGE_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {CHANGE_TABLE}_update',
+    f'DROP TRIGGER IF EXISTS {CHANGE_TABLE}_delete',
+)
+
+
+def create_change_triggers(apps, schema_editor):
+    # Без триггеров журнал остался бы пустым, и синхронизация молча
+    # теряла бы изменения.
+    if schema_editor.connection.vendor != 'sqlite':
+        raise NotSupportedError(
+            'Журнал изменений дневника ведут триггеры SQLite, '
+            f'{schema_editor.connection.vendor} не поддерживается.')
+    for statement in CREATE_CHANGE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('calories', '0009_diary_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EatenProductChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('eaten_product_id', models.BigIntegerField(db_index=True, verbose_name='Съеденный продукт')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удален')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'изменение дневника',
+                'verbose_name_plural': 'изменения дневника',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='eatenproductchange',
+            index=models.Index(fields=['user', 'id'], name='eaten_change_user_id_idx'),
+        ),
+        migrations.RunPython(create_change_triggers,
+                             run_on_sqlite(DROP_CHANGE_TRIGGERS),
+                             hints={'model_name': 'eatenproductchange'}),
+    ]
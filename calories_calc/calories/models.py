@@ -1,13 +1,25 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, F, Sum
 
 from .constants import (CHARACTER_QUANTITY, NAME_MAX_LENGTH,
                         UNIT_OF_MEASUREMENT, UOM_MAX_LENGTH)
+from .routers import is_sharded, shard_for_user
+from .versions import bump_version_on_commit, user_diary_version
 
 
 User = get_user_model()
 
 
+def eaten_kcal(kcal, weight, eaten_weight):
+    if not weight:
+        return 0
+    return (2 * kcal * int(eaten_weight) + weight) // (2 * weight)
+
+
 class NameModel(models.Model):
     name = models.CharField('Название',
                             max_length=NAME_MAX_LENGTH,
@@ -22,7 +34,7 @@ class WeightModel(models.Model):
     unit_of_measurement = models.CharField('Единица измерения',
                                            max_length=UOM_MAX_LENGTH,
                                            choices=UNIT_OF_MEASUREMENT)
-    kcal = models.PositiveSmallIntegerField('Ккал')
+    kcal = models.PositiveIntegerField('Ккал')
     category = models.ForeignKey('Category', on_delete=models.SET_NULL,
                                  null=True, verbose_name='Категория')
 
@@ -45,31 +57,219 @@ class Category(NameModel):
 
 
 class Product(NameModel, WeightModel):
-    pass
-
     class Meta:
         ordering = ('name',)
         default_related_name = 'products'
         verbose_name = 'продукт'
         verbose_name_plural = 'продукты'
+        indexes = (
+            models.Index(fields=('category', 'name'),
+                         name='product_category_name_idx'),
+        )
 
     def __str__(self):
         return self.name[:CHARACTER_QUANTITY]
 
+    def kcal_for(self, weight):
+        return eaten_kcal(self.kcal, self.weight, weight)
+
+
+class DiaryQuerySet(models.QuerySet):
+
+    def for_user(self, user_id):
+        queryset = self.filter(user_id=user_id)
+        if not is_sharded():
+            # Без шардов базу для чтения выбирает роутер реплик.
+            return queryset
+        return queryset.using(shard_for_user(user_id))
+
+
+class EatenProductQuerySet(DiaryQuerySet):
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        # save() без using выбирает шард по user_id через роутер.
+        eaten_product = self.model(**kwargs)
+        eaten_product.save(force_insert=True)
+        return eaten_product
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if self._db is not None or not is_sharded():
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        by_shard = defaultdict(list)
+        for obj in objs:
+            by_shard[shard_for_user(obj.user_id)].append(obj)
+        for db, shard_objs in by_shard.items():
+            self.using(db).bulk_create(shard_objs, *args, **kwargs)
+        return objs
 
+
+# В шардах нет таблиц каталога и пользователей, поэтому там внешние
+# ключи дневников не проверяются базой (миграция 0009), удаление связанных
+# записей выполняется в calories.signals, а битые ссылки находит команда
+# check_diary_integrity. В основной базе ограничения остаются.
 class EatenProduct(WeightModel):
     publication_date = models.DateField('Дата добавления продукта',
                                         auto_now_add=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE,
                                 verbose_name='Продукт')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL,
+                                 null=True, verbose_name='Категория')
     user = models.ForeignKey(User, on_delete=models.CASCADE,
-                             verbose_name='Пользователь')
+                             db_index=False, verbose_name='Пользователь')
+
+    objects = EatenProductQuerySet.as_manager()
 
     class Meta:
         ordering = ('-publication_date',)
         default_related_name = 'eaten_products'
         verbose_name = 'съеденный продукт'
         verbose_name_plural = 'съеденные продукты'
+        indexes = (
+            models.Index(fields=('user', 'publication_date'),
+                         name='eaten_user_date_idx'),
+            models.Index(fields=('user', 'category', 'publication_date'),
+                         name='eaten_user_category_date_idx'),
+        )
 
     def __str__(self):
         return f'{self.user} - {self.publication_date} - {self.product}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+@contextmanager
+def explicit_publication_date():
+    # bulk_create с auto_now_add перезаписал бы дату каждой записи.
+    field = EatenProduct._meta.get_field('publication_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+# Журнал изменений дневника для синхронизации клиентов. Строки пишут
+# триггеры SQLite (миграция 0010, на других базах она падает), поэтому
+# в журнал попадают и bulk_create, и каскадные удаления. На каждую запись
+# дневника хранится только последнее изменение; удаление оставляет запись
+# с deleted=True. Триггеры пишут журнал и во время удаления пользователя,
+# поэтому ключ на пользователя не проверяется базой.
+class EatenProductChange(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             db_index=False, db_constraint=False,
+                             related_name='+',
+                             verbose_name='Пользователь')
+    eaten_product_id = models.BigIntegerField('Съеденный продукт',
+                                              db_index=True)
+    deleted = models.BooleanField('Удален', default=False)
+
+    objects = DiaryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'изменение дневника'
+        verbose_name_plural = 'изменения дневника'
+        indexes = (
+            models.Index(fields=('user', 'id'),
+                         name='eaten_change_user_id_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.user_id} - {self.id} - {self.eaten_product_id}'
+
+
+class DailyKcalTotalManager(models.Manager.from_queryset(DiaryQuerySet)):
+
+    def add(self, user_id, date, kcal, entries):
+        if entries > 0:
+            self.increment(user_id, {date: (kcal, entries)})
+            return
+        days = self.for_user(user_id).filter(date=date)
+        days.update(total_kcal=F('total_kcal') + kcal,
+                    entries=F('entries') + entries)
+        if entries < 0:
+            days.filter(entries__lte=0).delete()
+
+    def increment(self, user_id, days):
+        # Одна вставка с ON CONFLICT вместо UPDATE и INSERT для первой
+        # записи за день.
+        connection = connections[shard_for_user(user_id)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(days))
+        params = [
+            value for date, (kcal, entries) in days.items()
+            for value in (user_id, connection.ops.adapt_datefield_value(date),
+                          kcal, entries)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, date, total_kcal, entries) '
+                f'VALUES {values} ON CONFLICT (user_id, date) DO UPDATE '
+                f'SET total_kcal = {table}.total_kcal + excluded.total_kcal, '
+                f'entries = {table}.entries + excluded.entries', params)
+
+    def calculate(self, using, user_ids=None):
+        days = EatenProduct.objects.using(using).order_by()
+        if user_ids is not None:
+            days = days.filter(user_id__in=user_ids)
+        days = days.values('user_id', 'publication_date').annotate(
+            total_kcal=Sum('kcal'), entries=Count('id'))
+        return {
+            (day['user_id'], day['publication_date']):
+            (day['total_kcal'], day['entries'])
+            for day in days.iterator()
+        }
+
+    def rebuild(self, using, user_ids=None):
+        totals = self.using(using)
+        if user_ids is not None:
+            totals = totals.filter(user_id__in=user_ids)
+        totals.delete()
+        self.using(using).bulk_create(
+            (self.model(user_id=user_id, date=date,
+                        total_kcal=total_kcal, entries=entries)
+             for (user_id, date), (total_kcal, entries)
+             in self.calculate(using, user_ids).items()),
+            batch_size=1000)
+
+    def add_eaten_products(self, eaten_products):
+        days = defaultdict(dict)
+        for eaten_product in eaten_products:
+            user_days = days[eaten_product.user_id]
+            kcal, entries = user_days.get(eaten_product.publication_date,
+                                          (0, 0))
+            user_days[eaten_product.publication_date] = (
+                kcal + eaten_product.kcal, entries + 1)
+        for user_id, user_days in days.items():
+            self.increment(user_id, user_days)
+            bump_version_on_commit(user_diary_version(user_id))
+
+
+class DailyKcalTotal(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             verbose_name='Пользователь')
+    date = models.DateField('Дата')
+    total_kcal = models.PositiveIntegerField('Ккал за день', default=0)
+    entries = models.PositiveIntegerField('Количество продуктов',
+                                          default=0)
+
+    objects = DailyKcalTotalManager()
+
+    class Meta:
+        ordering = ('-date',)
+        default_related_name = 'daily_kcal_totals'
+        verbose_name = 'калорийность за день'
+        verbose_name_plural = 'калорийность по дням'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'date'),
+                                    name='unique_user_date'),
+        )
+
+    def __str__(self):
+        return f'{self.user} - {self.date} - {self.total_kcal}'
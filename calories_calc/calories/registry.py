@@ -0,0 +1,58 @@
+from threading import Lock
+
+from .constants import CATEGORY_VERSION
+from .models import Category
+from .versions import get_version
+
+
+class CategoryRegistry:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.by_slug = {}
+        self.slug_by_id = {}
+
+    def invalidate(self):
+        self.version = None
+
+    def refresh(self):
+        version = get_version(CATEGORY_VERSION)
+        if version != self.version:
+            with self.lock:
+                rows = list(Category.objects.values_list('id', 'slug',
+                                                         'name'))
+                self.slug_by_id = {id: slug for id, slug, _ in rows}
+                self.by_slug = {row[1]: row for row in rows}
+                self.version = version
+
+    def slugs(self):
+        self.refresh()
+        return self.slug_by_id
+
+    def row_for(self, slug):
+        self.refresh()
+        row = self.by_slug.get(slug)
+        if row is None:
+            # Новая версия могла еще не дойти до кеша этого процесса.
+            row = Category.objects.filter(slug=slug).values_list(
+                'id', 'slug', 'name').first()
+            if row is not None:
+                self.invalidate()
+        return row
+
+    def id_for(self, slug):
+        row = self.row_for(slug)
+        return None if row is None else row[0]
+
+    def get(self, slug):
+        row = self.row_for(slug)
+        if row is None:
+            return None
+        id, slug, name = row
+        category = Category(id=id, slug=slug, name=name)
+        category._state.adding = False
+        return category
+
+
+category_registry = CategoryRegistry()
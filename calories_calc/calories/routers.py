@@ -0,0 +1,140 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from zlib import crc32
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .constants import (DIARY_SHARD_PREFIX, PRIMARY_READS_CACHE_PREFIX,
+                        REPLICAS_REFRESHED_CACHE_KEY)
+from .versions import state_cache
+
+SHARDED_MODELS = frozenset(('eatenproduct', 'eatenproductchange',
+                            'dailykcaltotal'))
+
+# Чтение с реплик включается только на время безопасных запросов
+# к вьюсетам, все остальное читает основную базу.
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+def _primary_reads_key(user_id):
+    return f'{PRIMARY_READS_CACHE_PREFIX}:{user_id}'
+
+
+def pin_to_primary(user_id):
+    # После USER_STATE_TIMEOUT измененные данные все равно читаются
+    # с основной базы по версиям, пока реплики не обновлены.
+    state_cache.set(_primary_reads_key(user_id), time.time(),
+                    settings.USER_STATE_TIMEOUT)
+
+
+def is_pinned_to_primary(user_id, refreshed):
+    # Пользователь читает основную базу, пока его последняя запись
+    # не попала в реплики.
+    written = state_cache.get(_primary_reads_key(user_id))
+    return written is not None and written >= refreshed
+
+
+def mark_replicas_refreshed(started):
+    state_cache.set(REPLICAS_REFRESHED_CACHE_KEY, started, None)
+
+
+def replicas_refreshed_at():
+    return state_cache.get(REPLICAS_REFRESHED_CACHE_KEY)
+
+
+def diary_shards():
+    return [f'{DIARY_SHARD_PREFIX}{number}'
+            for number in range(settings.DIARY_SHARDS)]
+
+
+def diary_databases():
+    return diary_shards() or [DEFAULT_DB_ALIAS]
+
+
+def is_sharded():
+    return settings.DIARY_SHARDS > 0
+
+
+def shard_for_user(user_id):
+    # crc32 не зависит от PYTHONHASHSEED, поэтому шард пользователя
+    # одинаков во всех процессах.
+    if not is_sharded() or user_id is None:
+        return DEFAULT_DB_ALIAS
+    shards = diary_shards()
+    return shards[crc32(str(user_id).encode()) % len(shards)]
+
+
+def is_sharded_model(model):
+    return (model._meta.app_label == 'calories'
+            and model._meta.model_name in SHARDED_MODELS)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or not read_from_replica.get()
+                or is_sharded_model(model) and is_sharded()):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if (instance is not None
+                and instance._state.db in settings.DATABASE_REPLICAS):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class DiaryShardRouter:
+
+    def db_for_model(self, model, **hints):
+        instance = hints.get('instance')
+        if not is_sharded_model(model):
+            # Иначе Django прочитает связанный продукт из базы дневника.
+            if instance is not None and is_sharded_model(type(instance)):
+                return DEFAULT_DB_ALIAS
+            return None
+        if not isinstance(instance, model):
+            return None
+        # У новой записи _state.db подставляется из присвоенного продукта,
+        # поэтому шард выбирается по пользователю.
+        if instance._state.adding:
+            return shard_for_user(instance.user_id)
+        return instance._state.db
+
+    db_for_read = db_for_model
+    db_for_write = db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded_model(type(obj1)) or is_sharded_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not db.startswith(DIARY_SHARD_PREFIX):
+            return None
+        return app_label == 'calories' and model_name in SHARDED_MODELS
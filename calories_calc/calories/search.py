@@ -0,0 +1,41 @@
+import re
+
+from django.db import connection
+
+from .constants import PRODUCT_SEARCH_TABLE
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize(text):
+    return text.casefold().replace('ё', 'е')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    words = WORD_PATTERN.findall(normalize(query))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def product_ids_subquery(query):
+    return (f'SELECT rowid FROM {PRODUCT_SEARCH_TABLE} '
+            f'WHERE {PRODUCT_SEARCH_TABLE} MATCH %s',
+            (match_expression(query),))
+
+
+def autocomplete(query, limit):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT product.id, product.name '
+            f'FROM {PRODUCT_SEARCH_TABLE} AS search '
+            f'JOIN calories_product AS product ON product.id = search.rowid '
+            f'WHERE {PRODUCT_SEARCH_TABLE} MATCH %s '
+            f'ORDER BY search.rank, product.name LIMIT %s',
+            (expression, limit))
+        return [{'id': id, 'name': name} for id, name in cursor.fetchall()]
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .constants import CATALOG_VERSION, CATEGORY_VERSION
+from .models import (Category, DailyKcalTotal, EatenProduct,
+                     EatenProductChange, Product, User)
+from .registry import category_registry
+from .routers import diary_shards
+from .versions import (bump_version_on_commit, set_token_version_on_commit,
+                       token_version, user_diary_version)
+
+
+@receiver(post_save, sender=EatenProduct)
+def add_eaten_product_to_daily_total(sender, instance, created, **kwargs):
+    if created:
+        DailyKcalTotal.objects.add(instance.user_id,
+                                   instance.publication_date,
+                                   instance.kcal, 1)
+    else:
+        loaded = getattr(instance, '_loaded_values', {})
+        old_key = (loaded.get('user_id', instance.user_id),
+                   loaded.get('publication_date', instance.publication_date))
+        new_key = (instance.user_id, instance.publication_date)
+        old_kcal = loaded.get('kcal', instance.kcal)
+        if old_key != new_key:
+            DailyKcalTotal.objects.add(*old_key, -old_kcal, -1)
+            DailyKcalTotal.objects.add(*new_key, instance.kcal, 1)
+        elif old_kcal != instance.kcal:
+            DailyKcalTotal.objects.add(*new_key,
+                                       instance.kcal - old_kcal, 0)
+        if old_key[0] != instance.user_id:
+            bump_version_on_commit(user_diary_version(old_key[0]))
+    bump_version_on_commit(user_diary_version(instance.user_id))
+    instance._loaded_values = {
+        'user_id': instance.user_id,
+        'publication_date': instance.publication_date,
+        'kcal': instance.kcal,
+    }
+
+
+@receiver(post_delete, sender=EatenProduct)
+def remove_eaten_product_from_daily_total(sender, instance, **kwargs):
+    DailyKcalTotal.objects.add(instance.user_id, instance.publication_date,
+                               -instance.kcal, -1)
+    bump_version_on_commit(user_diary_version(instance.user_id))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_catalog_version(sender, **kwargs):
+    bump_version_on_commit(CATALOG_VERSION)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_version(sender, **kwargs):
+    bump_version_on_commit(CATEGORY_VERSION)
+    category_registry.invalidate()
+    transaction.on_commit(category_registry.invalidate)
+
+
+# Каскад для дневников в шардах: Django удаляет связанные записи только
+# в базе удаляемого объекта.
+@receiver(post_delete, sender=Product)
+def delete_sharded_eaten_products(sender, instance, **kwargs):
+    for db in diary_shards():
+        EatenProduct.objects.using(db).filter(product_id=instance.id).delete()
+
+
+@receiver(post_delete, sender=Category)
+def clear_sharded_eaten_product_category(sender, instance, **kwargs):
+    for db in diary_shards():
+        EatenProduct.objects.using(db).filter(
+            category_id=instance.id).update(category=None)
+
+
+@receiver(post_delete, sender=User)
+def delete_sharded_diary(sender, instance, **kwargs):
+    for db in diary_shards():
+        EatenProduct.objects.using(db).filter(user_id=instance.id).delete()
+        DailyKcalTotal.objects.using(db).filter(user_id=instance.id).delete()
+        EatenProductChange.objects.using(db).filter(
+            user_id=instance.id).delete()
+
+
+# Токены несут версию из хеша пароля: смена пароля, деактивация или
+# удаление пользователя отзывают выданные токены на всех процессах.
+@receiver(post_save, sender=User)
+def update_token_version(sender, instance, **kwargs):
+    set_token_version_on_commit(instance.id, token_version(instance))
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    set_token_version_on_commit(instance.id, '')
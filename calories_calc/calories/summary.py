@@ -0,0 +1,84 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Sum
+
+from .registry import category_registry
+
+BUCKET_DAY = 'day'
+BUCKET_WEEK = 'week'
+BUCKET_MONTH = 'month'
+BUCKETS = (BUCKET_DAY, BUCKET_WEEK, BUCKET_MONTH)
+
+
+def bucket_start(day, bucket):
+    if bucket == BUCKET_WEEK:
+        return day - timedelta(days=day.weekday())
+    if bucket == BUCKET_MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(start, bucket):
+    if bucket == BUCKET_WEEK:
+        return start + timedelta(days=6)
+    if bucket == BUCKET_MONTH:
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(
+            day=1)
+        return next_month - timedelta(days=1)
+    return start
+
+
+def summarize_days(days):
+    if not days:
+        return {'total_kcal': 0, 'days': 0, 'average_kcal': 0,
+                'min_day': None, 'max_day': None}
+    total = sum(days.values())
+    min_date = min(days, key=lambda day: (days[day], day))
+    max_date = max(days, key=lambda day: (days[day], day))
+    return {
+        'total_kcal': total,
+        'days': len(days),
+        'average_kcal': round(total / len(days)),
+        'min_day': {'date': min_date, 'total_kcal': days[min_date]},
+        'max_day': {'date': max_date, 'total_kcal': days[max_date]},
+    }
+
+
+def build_summary(eaten_products, date_from, date_to, bucket):
+    rows = eaten_products.filter(
+        publication_date__range=(date_from, date_to)
+    ).order_by().values_list(
+        'publication_date', 'category_id'
+    ).annotate(kcal=Sum('kcal'))
+    category_slugs = category_registry.slugs()
+    days = defaultdict(dict)
+    categories = defaultdict(lambda: defaultdict(int))
+    for day, category_id, kcal in rows:
+        category = category_slugs.get(category_id)
+        start = bucket_start(day, bucket)
+        days[start][day] = days[start].get(day, 0) + kcal
+        categories[start][category] += kcal
+    all_days = {
+        day: kcal for bucket_days in days.values()
+        for day, kcal in bucket_days.items()
+    }
+    return {
+        'from': date_from,
+        'to': date_to,
+        'bucket': bucket,
+        **summarize_days(all_days),
+        'buckets': [
+            {
+                'start': start,
+                'end': bucket_end(start, bucket),
+                **summarize_days(days[start]),
+                'categories': [
+                    {'category': category, 'total_kcal': kcal}
+                    for category, kcal in sorted(
+                        categories[start].items(),
+                        key=lambda item: -item[1])
+                ],
+            } for start in sorted(days)
+        ],
+    }
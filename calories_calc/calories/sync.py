@@ -0,0 +1,70 @@
+from django.db.models import Max
+
+from .constants import DIARY_CHANGES_LIMIT
+from .models import EatenProductChange
+from .routers import shard_for_user
+
+TOKEN_SEPARATOR = ':'
+
+
+# В токене хранится база дневника: после переноса пользователя в другой
+# шард номера изменений начинаются заново и клиенту нужна полная
+# синхронизация. Пока полная синхронизация не закончена, в токене есть
+# еще последний отданный id записи дневника.
+def make_token(db, sequence, cursor=None):
+    parts = (db, sequence) if cursor is None else (db, sequence, cursor)
+    return TOKEN_SEPARATOR.join(map(str, parts))
+
+
+def parse_token(token, db):
+    token_db, *numbers = (token or '').split(TOKEN_SEPARATOR)
+    if (token_db != db or len(numbers) not in (1, 2)
+            or not all(number.isdigit() for number in numbers)):
+        return None
+    sequence, *cursor = map(int, numbers)
+    return sequence, cursor[0] if cursor else None
+
+
+def reset_page(db, sequence, cursor, eaten_products, limit):
+    if cursor is not None:
+        eaten_products = eaten_products.filter(id__gt=cursor)
+    rows = list(eaten_products.order_by('id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'token': make_token(db, sequence, rows[-1].id if has_more else None),
+        'reset': cursor is None,
+        'has_more': has_more,
+        'changed': rows,
+        'deleted': [],
+    }
+
+
+def diary_changes(user_id, token, eaten_products,
+                  limit=DIARY_CHANGES_LIMIT):
+    db = shard_for_user(user_id)
+    changes = EatenProductChange.objects.for_user(user_id)
+    parsed = parse_token(token, db)
+    if parsed is None:
+        # Номер берется до чтения дневника: изменения, сделанные во время
+        # полной синхронизации, придут после нее из журнала.
+        sequence = changes.aggregate(sequence=Max('id'))['sequence'] or 0
+        return reset_page(db, sequence, None, eaten_products, limit)
+    since, cursor = parsed
+    if cursor is not None:
+        return reset_page(db, since, cursor, eaten_products, limit)
+    rows = list(changes.filter(id__gt=since).order_by('id').values_list(
+        'id', 'eaten_product_id', 'deleted')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changed_ids = [eaten_product_id
+                   for _, eaten_product_id, deleted in rows if not deleted]
+    return {
+        'token': make_token(db, rows[-1][0] if rows else since),
+        'reset': False,
+        'has_more': has_more,
+        'changed': (list(eaten_products.filter(id__in=changed_ids)
+                         .order_by('id')) if changed_ids else []),
+        'deleted': [eaten_product_id
+                    for _, eaten_product_id, deleted in rows if deleted],
+    }
@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+from django.utils.crypto import salted_hmac
+
+from .constants import (DIARY_VERSION, STATE_CACHE_ALIAS,
+                        TOKEN_VERSION_CACHE_PREFIX, VERSION_CACHE_PREFIX)
+
+state_cache = ConnectionProxy(caches, STATE_CACHE_ALIAS)
+
+
+def _new_version():
+    # Версия берется из текущего времени, а не инкрементом: после вытеснения
+    # ключа она не вернется к уже использованному значению, а при
+    # одновременных изменениях из разных процессов обновление не потеряется.
+    return time.time_ns()
+
+
+def _version_key(name):
+    return f'{VERSION_CACHE_PREFIX}:{name}'
+
+
+def _modified_key(name):
+    return f'{VERSION_CACHE_PREFIX}:{name}:modified'
+
+
+def _timeout(name):
+    # Версии дневников отдельных пользователей не копятся бесконечно.
+    if name.startswith(f'{DIARY_VERSION}:'):
+        return settings.USER_STATE_TIMEOUT
+    return None
+
+
+def get_version(name):
+    key = _version_key(name)
+    version = state_cache.get(key)
+    if version is None:
+        state_cache.add(key, _new_version(), _timeout(name))
+        state_cache.add(_modified_key(name), time.time(), _timeout(name))
+        version = state_cache.get(key)
+    return version
+
+
+def get_versions(names):
+    keys = [_version_key(name) for name in names]
+    modified_keys = [_modified_key(name) for name in names]
+    values = state_cache.get_many(keys + modified_keys)
+    versions = []
+    last_modified = 0
+    for name, key, modified_key in zip(names, keys, modified_keys):
+        version = values.get(key)
+        modified = values.get(modified_key)
+        if version is None or modified is None:
+            version = get_version(name)
+            modified = state_cache.get(modified_key) or time.time()
+        versions.append(version)
+        last_modified = max(last_modified, modified)
+    return tuple(versions), last_modified
+
+
+def bump_version(name):
+    version = _new_version()
+    state_cache.set_many({_version_key(name): version,
+                          _modified_key(name): time.time()}, _timeout(name))
+    return version
+
+
+def user_diary_version(user_id):
+    return f'{DIARY_VERSION}:{user_id}'
+
+
+def bump_version_on_commit(name):
+    bump_version(name)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def token_version(user):
+    # Меняется при смене пароля; у неактивного пользователя пустая версия
+    # не совпадает ни с одним токеном.
+    if not user.is_active:
+        return ''
+    return salted_hmac(TOKEN_VERSION_CACHE_PREFIX, user.password,
+                       algorithm='sha256').hexdigest()[:16]
+
+
+def _token_version_key(user_id):
+    return f'{TOKEN_VERSION_CACHE_PREFIX}:{user_id}'
+
+
+def get_token_version(user_id):
+    return state_cache.get(_token_version_key(user_id))
+
+
+def add_token_version(user_id, version):
+    # Не перезаписывает версию, выставленную при изменении пользователя
+    # после того, как она была прочитана из базы.
+    state_cache.add(_token_version_key(user_id), version,
+                    settings.USER_STATE_TIMEOUT)
+
+
+def set_token_version_on_commit(user_id, version):
+    key = _token_version_key(user_id)
+    state_cache.set(key, version, settings.USER_STATE_TIMEOUT)
+    transaction.on_commit(
+        lambda: state_cache.set(key, version, settings.USER_STATE_TIMEOUT))
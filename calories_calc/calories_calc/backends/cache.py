@@ -0,0 +1,150 @@
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_connections = threading.local()
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в отдельном файле SQLite, общий для всех процессов.
+
+    Запись стоит одной строки, а не обхода каталога, как у файлового
+    кеша, и incr атомарен между процессами. Целые числа хранятся как
+    INTEGER, остальное -- через pickle. Просроченные ключи удаляются при
+    записи не чаще раза в CULL_INTERVAL секунд (по умолчанию 60).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = str(location)
+        self.cull_interval = params.get('OPTIONS', {}).get(
+            'CULL_INTERVAL', 60)
+        self.culled_at = 0
+
+    @property
+    def connection(self):
+        # sqlite3 не разрешает использовать соединение из других потоков.
+        connections = _connections.__dict__.setdefault('connections', {})
+        connection = connections.get(self.location)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.location, timeout=20, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            connections[self.location] = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        return pickle.loads(value) if isinstance(value, bytes) else value
+
+    def _cull(self, now):
+        if now - self.culled_at >= self.cull_interval:
+            self.connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (now,))
+            self.culled_at = now
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        self._cull(now)
+        cursor = self.connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            (self._key(key, version), self._dump(value),
+             self.get_backend_timeout(timeout), now))
+        return cursor.rowcount > 0
+
+    def get(self, key, default=None, version=None):
+        row = self.connection.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())).fetchone()
+        return default if row is None else self._load(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self.connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN '
+            f'({", ".join("?" * len(keys))}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()))
+        return {keys[key]: self._load(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._cull(time.time())
+        expires = self.get_backend_timeout(timeout)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [(self._key(key, version), self._dump(value), expires)
+                 for key, value in data.items()])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            updated = connection.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                (delta, key, time.time())).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found")
+            value = connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)).fetchone()[0]
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def delete(self, key, version=None):
+        cursor = self.connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
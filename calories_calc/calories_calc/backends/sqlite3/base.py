@@ -0,0 +1,56 @@
+from django.db.backends.sqlite3 import base, features, operations
+
+
+class DatabaseFeatures(features.DatabaseFeatures):
+    # INSERT ... RETURNING появился в SQLite 3.35.
+    can_return_columns_from_insert = base.Database.sqlite_version_info >= (
+        3, 35)
+    can_return_rows_from_bulk_insert = can_return_columns_from_insert
+
+
+class DatabaseOperations(operations.DatabaseOperations):
+
+    def return_insert_columns(self, fields):
+        if not fields:
+            return '', ()
+        columns = ', '.join(
+            f'{self.quote_name(field.model._meta.db_table)}.'
+            f'{self.quote_name(field.column)}'
+            for field in fields)
+        return f'RETURNING {columns}', ()
+
+    def fetch_returned_insert_rows(self, cursor):
+        return cursor.fetchall()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с PRAGMA при открытии соединения и BEGIN IMMEDIATE.
+
+    Параметры задаются в OPTIONS:
+    pragmas -- словарь PRAGMA, выполняемых для каждого нового соединения;
+    transaction_mode -- режим BEGIN для transaction.atomic, например
+    IMMEDIATE, чтобы писатели ждали блокировку по busy timeout, а не
+    получали "database is locked" при повышении блокировки с чтения.
+
+    На SQLite 3.35+ bulk_create получает первичные ключи через RETURNING.
+    """
+    features_class = DatabaseFeatures
+    ops_class = DatabaseOperations
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
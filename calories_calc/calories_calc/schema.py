@@ -0,0 +1,102 @@
+from functools import lru_cache
+from hashlib import sha256
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import permissions
+from rest_framework.response import Response
+
+SCHEMA_FORMATS = {'openapi': 'json', 'json': 'json', 'yaml': 'yaml'}
+
+
+# drf_yasg импортируется только при первом обращении к документации.
+def get_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title='Kcal API',
+        default_version='v1',
+        description='Документация для приложения по расчету ккал',
+        contact=openapi.Contact(email='filippova-arina17@yandex.ru'),
+        license=openapi.License(name='NoLicense')
+    )
+
+
+def generate_schema(schema_format):
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    schema = OpenAPISchemaGenerator(get_info()).get_schema(public=True)
+    codec_class = {'json': OpenAPICodecJson,
+                   'yaml': OpenAPICodecYaml}[schema_format]
+    return codec_class(validators=[]).encode(schema)
+
+
+@lru_cache(maxsize=None)
+def get_ui_schema():
+    # Страницам Swagger UI и ReDoc из схемы нужны только название и версия,
+    # сама схема загружается ими по ?format=openapi.
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    return OpenAPISchemaGenerator(get_info(), patterns=[]).get_schema(
+        public=True)
+
+
+def get_schema_path(schema_format):
+    return settings.SCHEMA_DIR / f'schema.{schema_format}'
+
+
+@lru_cache(maxsize=None)
+def get_schema_document(schema_format):
+    path = get_schema_path(schema_format)
+    if path.is_file():
+        content = path.read_bytes()
+    else:
+        content = generate_schema(schema_format)
+    return content, quote_etag(sha256(content).hexdigest())
+
+
+def schema_response(request, schema_format, content_type):
+    content, etag = get_schema_document(schema_format)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    return response
+
+
+@lru_cache(maxsize=None)
+def get_schema_views():
+    from drf_yasg.views import get_schema_view
+
+    schema_view = get_schema_view(
+        get_info(),
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+
+    class CachedSchemaView(schema_view):
+
+        def get(self, request, version='', format=None):
+            renderer = request.accepted_renderer
+            schema_format = SCHEMA_FORMATS.get(renderer.format.lstrip('.'))
+            if schema_format is None:
+                return Response(get_ui_schema())
+            return schema_response(request, schema_format,
+                                   renderer.media_type)
+
+    return {
+        'schema': CachedSchemaView.without_ui(),
+        'swagger': CachedSchemaView.with_ui('swagger'),
+        'redoc': CachedSchemaView.with_ui('redoc'),
+    }
+
+
+def lazy_schema_view(name):
+
+    def view(request, *args, **kwargs):
+        return get_schema_views()[name](request, *args, **kwargs)
+
+    return view
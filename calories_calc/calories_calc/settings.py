@@ -1,5 +1,7 @@
+import os
 from datetime import timedelta
 from pathlib import Path
+from tempfile import gettempdir
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -32,6 +35,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'calories_calc.urls'
@@ -56,11 +60,99 @@ WSGI_APPLICATION = 'calories_calc.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'calories_calc.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+SQLITE_PRODUCTION_SETTINGS = {
+    'ENGINE': 'calories_calc.backends.sqlite3',
+    'CONN_MAX_AGE': 600,
+    'OPTIONS': {
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 20000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+
+if os.getenv('DB_PROFILE') == 'production':
+    DATABASES['default'].update(SQLITE_PRODUCTION_SETTINGS)
+
+# Дневники и итоги по дням распределяются по DIARY_SHARDS файлам SQLite
+# по хешу пользователя; каталог и пользователи остаются в default.
+DIARY_SHARDS = int(os.getenv('DIARY_SHARDS', 0))
+
+for shard in range(DIARY_SHARDS):
+    DATABASES[f'diary_{shard}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'diary_{shard}.sqlite3',
+    }
+
+# Реплики только для чтения: пути к копиям основной базы через запятую.
+# Безопасные запросы к вьюсетам читают с реплик, кроме данных, измененных
+# после последнего запуска refresh_replicas, и запросов пользователя,
+# чья запись еще не скопирована.
+DATABASE_REPLICAS = []
+
+for number, path in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(','))):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'NAME': Path(path),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = [
+    'calories.routers.ReplicaRouter',
+    'calories.routers.DiaryShardRouter',
+]
+
+# Кеши общие для всех процессов. В default лежат ответы каталога;
+# в state -- версии данных, версии токенов и время обновления реплик,
+# через которые ответы, ETag и реестр категорий сбрасываются на всех
+# воркерах. Состояние пишется на каждое изменение, поэтому хранится
+# в отдельном файле SQLite, а не в каталоге файлового кеша.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'CACHE_DIRECTORY', Path(gettempdir()) / 'calories_calc_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'state': {
+        'BACKEND': 'calories_calc.backends.cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'STATE_CACHE_PATH',
+            Path(gettempdir()) / 'calories_calc_state.sqlite3'),
+    },
+}
+
+# Сколько хранятся версии дневника и токенов одного пользователя;
+# после истечения они заново читаются из базы.
+USER_STATE_TIMEOUT = 24 * 60 * 60
+
+TEST_RUNNER = 'calories_calc.test_runner.TestRunner'
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Токен для сборщика метрик: Authorization: Bearer <METRICS_TOKEN>.
+# Без токена /metrics доступен только сотрудникам.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+PROFILER = {
+    'ENABLED': os.getenv('PROFILER_ENABLED') == '1',
+    'DIRECTORY': Path(os.getenv('PROFILER_DIRECTORY', BASE_DIR / 'profiles')),
+    'SAMPLE_RATE': int(os.getenv('PROFILER_SAMPLE_RATE', 0)),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,11 +194,26 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 5
 }
 
+FAST_JSON = os.getenv('FAST_JSON') == '1'
+
+if FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 SIMPLE_JWT = {
    'ACCESS_TOKEN_LIFETIME': timedelta(days=5),
    'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+SCHEMA_DIR = BASE_DIR / 'schema'
+
 SWAGGER_SETTINGS = {
    'SECURITY_DEFINITIONS': {
       'Bearer': {
@@ -1,33 +1,27 @@
 from django.contrib import admin
 from django.conf.urls import url
 from django.urls import include, path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
+from api.metrics import metrics_view
+from api.profiling import profile_file_view, profile_list_view
+from .schema import lazy_schema_view
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title='Kcal API',
-        default_version='v1',
-        description='Документация для приложения по расчету ккал',
-        contact=openapi.Contact(email='filippova-arina17@yandex.ru'),
-        license=openapi.License(name='NoLicense')
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list_view),
+         name='profiles'),
+    path('admin/profiles/<str:name>', admin.site.admin_view(profile_file_view),
+         name='profile-file'),
     path('admin/', admin.site.urls),
-    path('api/', include('api.urls'))
+    path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 urlpatterns += [
    url(r'^swagger(?P<format>\.json|\.yaml)$',
-       schema_view.without_ui(cache_timeout=0), name='schema-json'),
-   url(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0),
+       lazy_schema_view('schema'), name='schema-json'),
+   url(r'^swagger/$', lazy_schema_view('swagger'),
        name='schema-swagger-ui'),
-   url(r'^redoc/$', schema_view.with_ui('redoc', cache_timeout=0),
+   url(r'^redoc/$', lazy_schema_view('redoc'),
        name='schema-redoc'),
 ]